@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core import checks
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Response cache generations, index version stamps and the tag map
+    are shared through the default cache, so it has to be shared too.
+    """
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [checks.Warning(
+        'The default cache is local to one process.',
+        hint=('Other workers and management commands will not see cache '
+              'invalidations, so recipe responses, ingredient and recipe '
+              'indexes and the tag map may stay stale until restart. Use a '
+              'shared backend such as DatabaseCache (the default).'),
+        id='api.W001',
+    )]
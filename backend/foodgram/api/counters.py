@@ -0,0 +1,40 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Cart, Favorite, Recipe
+from users.models import CustomUser, Follow
+
+# model, counter field, counted model and its foreign key to the model.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'carts_count', Cart, 'recipe'),
+    (CustomUser, 'recipes_count', Recipe, 'author'),
+    (CustomUser, 'followers_count', Follow, 'author'),
+)
+
+
+def actual_count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def stale_counters(counters=COUNTERS):
+    """Return {counter: number of rows where it is out of sync}."""
+    return {
+        f'{model.__name__}.{counter}': model.objects.exclude(
+            **{counter: actual_count(counted, field)}
+        ).count()
+        for model, counter, counted, field in counters
+    }
+
+
+def reconcile_counters(counters=COUNTERS):
+    """Recount drifted counters; return {counter: number of fixed rows}."""
+    return {
+        f'{model.__name__}.{counter}': model.objects.exclude(
+            **{counter: actual_count(counted, field)}
+        ).update(**{counter: actual_count(counted, field)})
+        for model, counter, counted, field in counters
+    }
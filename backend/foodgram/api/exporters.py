@@ -0,0 +1,103 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class Echo:
+    """File-like object returning written value instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartExporter(BaseRenderer):
+    """
+    Base class for shopping cart formats.
+
+    Exporters are DRF renderers, so the format is negotiated from
+    ``?format=`` or the Accept header, but the cart itself is streamed
+    row by row by ``stream()`` instead of being rendered in memory.
+    """
+
+    charset = 'utf-8'
+    filename = 'shopping_cart'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only error responses of the download action get here.
+        return JSONRenderer().render(data)
+
+    def get_filename(self):
+        return f'{self.filename}.{self.format}'
+
+    def stream(self, ingredients):
+        yield self.header()
+        for ingredient in ingredients:
+            yield self.row(ingredient)
+        yield self.footer()
+
+    def header(self):
+        return ''
+
+    def row(self, ingredient):
+        raise NotImplementedError
+
+    def footer(self):
+        return ''
+
+
+class TextExporter(ShoppingCartExporter):
+    """Shopping cart as a plain text list."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def header(self):
+        return 'Список покупок: \n'
+
+    def row(self, ingredient):
+        return (
+            f'{ingredient["name"]} - '
+            f'{ingredient["total"]} '
+            f'{ingredient["measurement_unit"]} \n'
+        )
+
+
+class CSVExporter(ShoppingCartExporter):
+    """Shopping cart as a CSV table."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def __init__(self):
+        self.writer = csv.writer(Echo())
+
+    def header(self):
+        return self.writer.writerow(
+            ['Ингредиент', 'Количество', 'Единица измерения']
+        )
+
+    def row(self, ingredient):
+        return self.writer.writerow([
+            ingredient['name'],
+            ingredient['total'],
+            ingredient['measurement_unit'],
+        ])
+
+
+class JSONExporter(ShoppingCartExporter):
+    """Shopping cart as a JSON array."""
+
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, ingredients):
+        yield '['
+        separator = ''
+        for ingredient in ingredients:
+            yield separator + json.dumps(ingredient, ensure_ascii=False)
+            separator = ','
+        yield ']'
+
+
+SHOPPING_CART_EXPORTERS = (TextExporter, CSVExporter, JSONExporter)
@@ -0,0 +1,86 @@
+import base64
+import binascii
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+BASE64_CHUNK_SIZE = 4 * 64 * 1024
+
+
+def validate_image_size(size):
+    if size > settings.RECIPE_IMAGE_MAX_SIZE:
+        raise serializers.ValidationError(
+            f'Размер картинки не должен превышать '
+            f'{settings.RECIPE_IMAGE_MAX_SIZE // (1024 * 1024)} МБ!')
+
+
+def validate_image_limits(file):
+    """Reject images over the size or pixel limits from settings."""
+    validate_image_size(file.size)
+    position = file.tell()
+    try:
+        width, height = Image.open(file).size
+    except (OSError, Image.DecompressionBombError):
+        raise serializers.ValidationError('Загрузите корректную картинку.')
+    finally:
+        file.seek(position)
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise serializers.ValidationError(
+            'Разрешение картинки слишком большое!')
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    """
+    Base64 image field that checks size limits before decoding and
+    decodes the payload chunk by chunk into a temporary file, so the
+    decoded bytes are never held in memory as a whole.
+    """
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        # The payload is sliced in place: splitting off the header
+        # would copy the whole string.
+        content_type, start = None, 0
+        if ';base64,' in base64_data:
+            start = base64_data.index(';base64,')
+            content_type = base64_data[:start].replace('data:', '')
+            start += len(';base64,')
+        size = (
+            (len(base64_data) - start) * 3 // 4
+            - base64_data[-2:].count('=')
+        )
+        validate_image_size(size)
+        file = TemporaryUploadedFile(
+            uuid.uuid4().hex, content_type, size, None
+        )
+        try:
+            self.decode(base64_data, start, file)
+            validate_image_limits(file)
+            extension = Image.open(file).format.lower()
+            extension = 'jpg' if extension == 'jpeg' else extension
+            if extension not in self.ALLOWED_TYPES:
+                raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        except serializers.ValidationError:
+            file.close()
+            raise
+        file.seek(0)
+        file.name = f'{file.name}.{extension}'
+        return serializers.ImageField.to_internal_value(self, file)
+
+    def decode(self, base64_data, start, file):
+        try:
+            for start in range(start, len(base64_data), BASE64_CHUNK_SIZE):
+                file.write(base64.b64decode(
+                    base64_data[start:start + BASE64_CHUNK_SIZE],
+                    validate=True
+                ))
+        except (TypeError, binascii.Error, ValueError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        file.seek(0)
@@ -1,28 +1,130 @@
+from django import forms
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.functions import Lower
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Recipe
-from rest_framework.filters import SearchFilter
+from recipes.models import Recipe, Tag
+from rest_framework.filters import BaseFilterBackend
 from users.models import CustomUser
 
+from .ingredient_index import ingredient_index
 
-class IngredientsFilter(SearchFilter):
-    """Search filter for ingredients."""
+TAG_MAP_CACHE_KEY = 'tag_map'
+
+
+def get_tag_map():
+    """Return {slug: id} of all tags, kept in the shared cache."""
+    tag_map = cache.get(TAG_MAP_CACHE_KEY)
+    if tag_map is None:
+        tag_map = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(TAG_MAP_CACHE_KEY, tag_map, None)
+    return tag_map
+
+
+def invalidate_tag_map():
+    cache.delete(TAG_MAP_CACHE_KEY)
+
+
+class IngredientsFilter(BaseFilterBackend):
+    """
+    Autocomplete filter for ingredients.
+
+    Ingredients starting with the query go first, then ingredients
+    containing it, both ordered by name and capped by ``max_results``.
+    Both lookups go against ``LOWER(name)``, which is indexed, or against
+    the in-memory ingredient index when ``INGREDIENT_INDEX`` is enabled.
+    """
 
     search_param = 'name'
+    max_results = 50
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query or view.action != 'list':
+            return queryset
+        if settings.INGREDIENT_INDEX:
+            return ingredient_index.search(query, self.max_results)
+        return self.search_in_db(queryset, query)
+
+    def search_in_db(self, queryset, query):
+        query = query.lower()
+        queryset = queryset.annotate(name_lower=Lower('name')).order_by()
+        prefix = queryset.filter(name_lower__startswith=query)
+        contains = queryset.filter(name_lower__contains=query).exclude(
+            name_lower__startswith=query
+        )
+        return prefix.annotate(rank=Value(0)).union(
+            contains.annotate(rank=Value(1)), all=True
+        ).order_by('rank', 'name')[:self.max_results]
+
+
+class MultipleValueField(forms.Field):
+    """Form field taking every value of a repeated query parameter."""
+
+    widget = forms.SelectMultiple
+
+    def to_python(self, value):
+        return [item for item in value or () if item]
+
+
+class TagsFilter(filters.Filter):
+    """
+    Filter recipes by tag slugs with an EXISTS subquery, so recipes
+    with several matching tags are not duplicated. Slugs are resolved
+    to ids with the cached tag map. Recipes having any of the tags are
+    returned, or having all of them when ``tags_match=all`` is passed.
+    """
+
+    field_class = MultipleValueField
+
+    def filter(self, queryset, slugs):
+        if not slugs:
+            return queryset
+        tag_map = get_tag_map()
+        tag_ids = {tag_map[slug] for slug in slugs if slug in tag_map}
+        match_all = self.parent.form.cleaned_data.get('tags_match') == 'all'
+        if not tag_ids or (match_all and len(tag_ids) < len(set(slugs))):
+            return queryset.none()
+        recipe_tags = Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk')
+        )
+        if not match_all:
+            return queryset.filter(
+                Exists(recipe_tags.filter(tag_id__in=tag_ids))
+            )
+        for tag_id in tag_ids:
+            queryset = queryset.filter(
+                Exists(recipe_tags.filter(tag_id=tag_id))
+            )
+        return queryset
 
 
 class RecipesFilter(FilterSet):
-    """Filter for recipes."""
+    """
+    Filter for recipes. ``search`` keeps only recipes matching the
+    full-text query and orders them by relevance.
+    """
 
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = TagsFilter()
+    tags_match = filters.ChoiceFilter(
+        choices=(('any', 'any'), ('all', 'all')),
+        method='filter_tags_match'
+    )
     author = filters.ModelChoiceFilter(queryset=CustomUser.objects.all())
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
+        fields = ['tags', 'tags_match', 'author', 'is_favorited',
+                  'is_in_shopping_cart', 'search']
+
+    def filter_tags_match(self, queryset, name, value):
+        return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         return (queryset.filter(favorite__user=self.request.user)
@@ -33,3 +135,7 @@ class RecipesFilter(FilterSet):
         return (queryset.filter(cart__user=self.request.user)
                 if value and not self.request.user.is_anonymous
                 else queryset)
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        return queryset.search(value) if value else queryset
@@ -0,0 +1,118 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from recipes.models import Recipe
+
+from .response_cache import recipe_cache
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+
+
+def variant_name(image_hash, variant):
+    return os.path.join('recipes_images', image_hash, f'{variant}.jpg')
+
+
+def get_image_urls(recipe, request=None):
+    """Return URLs of all image variants of the recipe."""
+    if recipe.image_hash:
+        urls = {
+            variant: default_storage.url(
+                variant_name(recipe.image_hash, variant))
+            for variant in IMAGE_VARIANTS
+        }
+    elif recipe.image:
+        urls = dict.fromkeys(IMAGE_VARIANTS, recipe.image.url)
+    else:
+        urls = dict.fromkeys(IMAGE_VARIANTS)
+    if request is not None:
+        urls = {
+            variant: url and request.build_absolute_uri(url)
+            for variant, url in urls.items()
+        }
+    return urls
+
+
+def process_recipe_image(recipe_id):
+    """
+    Re-encode the uploaded image of the recipe into resized JPEG
+    variants stored under the hash of the upload, then point the
+    recipe to them. Identical uploads share files. The upload itself
+    is kept: its URL has already been returned to clients.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image or recipe.image_hash:
+        return
+    upload_name = recipe.image.name
+    with default_storage.open(upload_name, 'rb') as file:
+        content = file.read()
+    image_hash = hashlib.sha256(content).hexdigest()
+    if not default_storage.exists(variant_name(image_hash, 'full')):
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(content)))
+        image = image.convert('RGB')
+        for variant, size in IMAGE_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, 'JPEG', quality=85, optimize=True)
+            name = variant_name(image_hash, variant)
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+    full_name = variant_name(image_hash, 'full')
+    updated = Recipe.objects.filter(pk=recipe_id, image=upload_name).update(
+        image=full_name,
+        image_hash=image_hash,
+        updated_at=timezone.now()
+    )
+    if updated:
+        recipe_cache.bump()
+
+
+def _process(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception('Failed to process image of recipe %s', recipe_id)
+
+
+def _process_in_worker(recipe_id):
+    try:
+        _process(recipe_id)
+    finally:
+        connection.close()
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_WORKERS,
+        thread_name_prefix='recipe-images'
+    )
+
+
+def schedule_image_processing(recipe_id):
+    """
+    Process the recipe image in the background worker pool once the
+    current transaction commits, or in place if the pool is disabled.
+    """
+    if not settings.IMAGE_WORKERS:
+        transaction.on_commit(lambda: _process(recipe_id))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(_process_in_worker, recipe_id)
+    )
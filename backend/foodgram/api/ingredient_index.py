@@ -0,0 +1,76 @@
+import threading
+import uuid
+from bisect import bisect_left
+from itertools import islice
+
+from django.core.cache import cache
+from recipes.models import Ingredient
+
+VERSION_CACHE_KEY = 'ingredient_index_version'
+
+
+class IngredientIndex:
+    """
+    In-memory autocomplete index over all ingredients.
+
+    Names are case-folded and kept in a sorted list searched with bisect.
+    The index is built on first use and rebuilt whenever the version
+    stamp in the shared cache changes, so every worker process drops
+    its copy after an ingredient is saved or deleted anywhere.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._index = ([], [])
+
+    def invalidate(self):
+        cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+    def _current_version(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+            return cache.get(VERSION_CACHE_KEY)
+        return version
+
+    def _load(self):
+        version = self._current_version()
+        if version == self._version:
+            return self._index
+        with self._lock:
+            if version != self._version:
+                ingredients = sorted(
+                    Ingredient.objects.all(),
+                    key=lambda ingredient: (
+                        ingredient.name.casefold(), ingredient.name
+                    )
+                )
+                keys = [
+                    ingredient.name.casefold() for ingredient in ingredients
+                ]
+                self._index = (keys, ingredients)
+                self._version = version
+            return self._index
+
+    def search(self, query, limit):
+        """Return ingredients starting with query, then containing it."""
+        keys, ingredients = self._load()
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = start
+        while (end < len(keys) and end - start < limit
+               and keys[end].startswith(query)):
+            end += 1
+        result = ingredients[start:end]
+        if len(result) < limit:
+            result.extend(islice(
+                (ingredient
+                 for key, ingredient in zip(keys, ingredients)
+                 if query in key and not key.startswith(query)),
+                limit - len(result)
+            ))
+        return result
+
+
+ingredient_index = IngredientIndex()
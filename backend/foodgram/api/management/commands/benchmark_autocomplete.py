@@ -0,0 +1,67 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from recipes.models import Ingredient
+
+from ...filters import IngredientsFilter
+from ...ingredient_index import ingredient_index
+from ...metrics import percentile
+
+
+class Command(BaseCommand):
+    help = ('Measure latency of ingredient autocomplete in the database '
+            'and in the in-memory index, e.g. after '
+            'generate_fixtures --ingredients 100000 on an empty database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def queries(self, count, seed):
+        """Prefixes of random names, as typed key by key."""
+        rng = random.Random(seed)
+        ids = list(Ingredient.objects.values_list('id', flat=True))
+        names = Ingredient.objects.in_bulk(
+            rng.choice(ids) for _ in range(count)
+        )
+        return [
+            name[:rng.randint(1, min(5, len(name)))]
+            for name in (names[pk].name for pk in rng.sample(
+                list(names), min(count, len(names))))
+        ]
+
+    def measure(self, name, search, queries):
+        timings, found = list(), 0
+        for query in queries:
+            started = time.perf_counter()
+            found += len(list(search(query)))
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'{name:8} p50 {percentile(timings, 0.5):8.2f} '
+            f'p95 {percentile(timings, 0.95):8.2f} '
+            f'p99 {percentile(timings, 0.99):8.2f} ms, '
+            f'{found / len(queries):.0f} results per query'
+        )
+
+    def handle(self, *args, **options):
+        ingredients = Ingredient.objects.count()
+        if not ingredients:
+            raise CommandError(
+                'No ingredients found, run load_data or generate_fixtures.'
+            )
+        queries = self.queries(options['queries'], options['seed'])
+        backend = IngredientsFilter()
+        self.stdout.write(
+            f'{len(queries)} prefixes over {ingredients} ingredients '
+            f'({connection.vendor}), at most {backend.max_results} results:'
+        )
+        self.measure('database', lambda query: backend.search_in_db(
+            Ingredient.objects.all(), query
+        ), queries)
+        ingredient_index.invalidate()
+        ingredient_index.search('', 1)
+        self.measure('index', lambda query: ingredient_index.search(
+            query, backend.max_results
+        ), queries)
@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Ingredient, Recipe
+
+from ...metrics import percentile
+from ...recipe_index import cookable_in_db, recipe_index
+from ..factories import DataFactory
+
+
+class Command(BaseCommand):
+    help = ('Measure latency of searching recipes by available ingredients '
+            'with the in-memory index and with SQL, e.g. after '
+            'generate_fixtures --recipes 100000.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=15,
+            help='Number of available ingredients per query.'
+        )
+        parser.add_argument('--max-missing', type=int, default=2)
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=6,
+            help='Page size fetched by every query.'
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also measure the same queries with SQL.'
+        )
+
+    def measure(self, name, cookable, queries, options):
+        timings, found = list(), 0
+        for ingredient_ids in queries:
+            started = time.perf_counter()
+            recipes = cookable(ingredient_ids, options['max_missing'])
+            list(recipes[:options['limit']])
+            found += len(recipes)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'{name:6} p50 {percentile(timings, 0.5):8.2f} '
+            f'p95 {percentile(timings, 0.95):8.2f} '
+            f'p99 {percentile(timings, 0.99):8.2f} ms, '
+            f'{found / len(queries):.0f} recipes per query'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.count()
+        ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        if not recipes or not ingredient_ids:
+            raise CommandError(
+                'No recipes found, run generate_fixtures first.'
+            )
+        factory = DataFactory(seed=options['seed'])
+        queries = [
+            factory.popular(ingredient_ids, options['ingredients'])
+            for _ in range(options['queries'])
+        ]
+        started = time.perf_counter()
+        recipe_index.invalidate()
+        recipe_index.cookable([])
+        self.stdout.write(
+            f'Index of {recipes} recipes built in '
+            f'{time.perf_counter() - started:.1f}s; {len(queries)} queries '
+            f'with {options["ingredients"]} ingredients, at most '
+            f'{options["max_missing"]} missing, page and count per query:'
+        )
+        self.measure('index', recipe_index.cookable, queries, options)
+        if options['compare']:
+            self.measure('sql', cookable_in_db, queries, options)
@@ -0,0 +1,132 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from recipes.models import CartIngredientTotal
+from users.models import CustomUser
+
+from ...exporters import SHOPPING_CART_EXPORTERS
+from ...metrics import percentile
+from ..factories import DataFactory
+
+
+class Command(BaseCommand):
+    help = ('Compare streamed and buffered shopping cart downloads: time '
+            'to the first chunk, total time and peak memory per format, '
+            'for carts of several sizes seeded into a test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--carts',
+            type=int,
+            nargs='+',
+            default=[10, 1000, 10000],
+            help='Numbers of recipes in seeded carts.'
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=2000,
+            help='Number of seeded ingredients.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='Id of the user whose cart is downloaded from the '
+                 'configured database instead of seeded carts.'
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def with_cart_sizes(self, users):
+        return users.annotate(
+            recipes=Count('cart', distinct=True),
+            rows=Count('cart_ingredient_total', distinct=True)
+        )
+
+    def get_user(self, user_id):
+        user = self.with_cart_sizes(
+            CustomUser.objects.filter(pk=user_id)
+        ).filter(rows__gt=0).first()
+        if user is None:
+            raise CommandError(f'User {user_id} has no shopping cart.')
+        return user
+
+    def seed(self, options):
+        factory = DataFactory(seed=options['seed'])
+        tag_ids = factory.tags(10)
+        ingredient_ids = factory.ingredients(options['ingredients'])
+        author_ids = factory.users(100, prefix='author')
+        recipe_ids = factory.recipes(
+            author_ids, max(options['carts']), tag_ids, ingredient_ids
+        )
+        user_ids = factory.users(len(options['carts']))
+        for user_id, size in zip(user_ids, options['carts']):
+            factory.carts([user_id], recipe_ids, (size, size))
+        CartIngredientTotal.objects.rebuild()
+        return self.with_cart_sizes(
+            CustomUser.objects.filter(pk__in=user_ids)
+        ).order_by('pk')
+
+    def streamed(self, exporter, rows):
+        chunks = exporter.stream(rows.iterator())
+        size = len(next(chunks).encode())
+        first_at = time.perf_counter()
+        for chunk in chunks:
+            size += len(chunk.encode())
+        return first_at, size
+
+    def buffered(self, exporter, rows):
+        body = ''.join(exporter.stream(list(rows))).encode()
+        return time.perf_counter(), len(body)
+
+    def measure(self, name, download, exporter_class, rows, repeat):
+        first_chunk, total, peaks = list(), list(), list()
+        for _ in range(repeat):
+            tracemalloc.start()
+            started = time.perf_counter()
+            first_at, size = download(exporter_class(), rows.all())
+            finished = time.perf_counter()
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+            tracemalloc.stop()
+            first_chunk.append((first_at - started) * 1000)
+            total.append((finished - started) * 1000)
+        self.stdout.write(
+            f'{exporter_class.format:4} {name:8} '
+            f'first chunk p50 {percentile(first_chunk, 0.5):8.2f} ms, '
+            f'total p50 {percentile(total, 0.5):8.2f} ms, '
+            f'peak memory {max(peaks):8.0f} KiB, {size} bytes'
+        )
+
+    def benchmark(self, user, repeat):
+        rows = CartIngredientTotal.objects.shopping_list(user)
+        self.stdout.write(
+            f'Cart of {user.recipes} recipes, {user.rows} ingredients, '
+            f'{repeat} downloads per format:'
+        )
+        for exporter_class in SHOPPING_CART_EXPORTERS:
+            for name, download in (
+                    ('streamed', self.streamed),
+                    ('buffered', self.buffered)):
+                self.measure(name, download, exporter_class, rows, repeat)
+
+    def handle(self, *args, **options):
+        if options['user'] is not None:
+            self.benchmark(self.get_user(options['user']), options['repeat'])
+            return
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            self.stdout.write('Seeding carts...')
+            started = time.monotonic()
+            users = list(self.seed(options))
+            self.stdout.write(
+                f'Seeded in {time.monotonic() - started:.1f}s.'
+            )
+            for user in users:
+                self.benchmark(user, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,155 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from recipes.models import CartIngredientTotal, IngredientAmount, Recipe, Tag
+from rest_framework import serializers
+
+from ...metrics import percentile
+from ...serializers import RecipeCreateSerializer
+from ..factories import DataFactory
+
+EDITS = ('amount', 'add', 'remove', 'tag', 'mixed')
+WRITES = ('insert', 'update', 'delete')
+
+
+def recreate(instance, validated_data):
+    """Previous update: drop and re-insert all tags and ingredients."""
+    serializer = RecipeCreateSerializer()
+    instance.tags.clear()
+    instance.tags.set(validated_data.pop('tags'))
+    cart_users = list(instance.cart.values_list('user_id', flat=True))
+    CartIngredientTotal.objects.remove_recipe(cart_users, instance)
+    IngredientAmount.objects.filter(recipe=instance).delete()
+    serializer.create_ingredients(validated_data.pop('ingredients'), instance)
+    CartIngredientTotal.objects.add_recipe(cart_users, instance)
+    return serializers.ModelSerializer.update(
+        serializer, instance, validated_data
+    )
+
+
+def diff(instance, validated_data):
+    return RecipeCreateSerializer().update(instance, validated_data)
+
+
+class RowCounter:
+    """Database execute wrapper counting statements and written rows."""
+
+    def __init__(self):
+        self.rows = Counter()
+        self.statements = 0
+        self.pending = None
+
+    def flush(self):
+        # Rows of INSERT ... RETURNING are only counted once they are
+        # fetched, so a write is counted when the next statement starts.
+        if self.pending is not None:
+            statement, cursor = self.pending
+            self.rows[statement] += max(cursor.rowcount, 0)
+            self.pending = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.flush()
+        self.statements += 1
+        statement = sql.lstrip().split(None, 1)[0].lower()
+        if statement in WRITES:
+            self.pending = statement, context['cursor']
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ('Compare rows written per recipe edit by the diff-based update '
+            'and by re-creating all tags and ingredient amounts, on data '
+            'seeded into a test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--edits', type=int, default=100,
+                            help='Number of measured edits per kind.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def seed(self, options):
+        factory = DataFactory(seed=options['seed'])
+        tag_ids = factory.tags(10)
+        ingredient_ids = factory.ingredients(500)
+        user_ids = factory.users(options['users'])
+        recipe_ids = factory.recipes(
+            user_ids, options['recipes'], tag_ids, ingredient_ids
+        )
+        factory.carts(user_ids, recipe_ids, (0, 20))
+        CartIngredientTotal.objects.rebuild()
+        return factory, tag_ids, ingredient_ids, recipe_ids
+
+    def edit(self, kind, recipe, tag_ids, ingredient_ids):
+        """Return validated data of an edit of the given kind."""
+        amounts = dict(IngredientAmount.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', 'amount'))
+        tags = set(recipe.tags.values_list('id', flat=True))
+        first = min(amounts)
+        if kind in ('amount', 'mixed'):
+            amounts[first] += 1
+        if kind in ('remove', 'mixed'):
+            del amounts[max(amounts)]
+        if kind in ('add', 'mixed'):
+            amounts[min(set(ingredient_ids) - set(amounts))] = 100
+        if kind in ('tag', 'mixed'):
+            tags.remove(max(tags))
+            tags.add(min(set(tag_ids) - tags))
+        return {
+            'tags': list(Tag.objects.filter(pk__in=tags)),
+            'ingredients': [
+                {'id': pk, 'amount': amount}
+                for pk, amount in amounts.items()
+            ],
+        }
+
+    def measure(self, kind, name, update, recipes, tag_ids, ingredient_ids):
+        counter, timings = RowCounter(), list()
+        for recipe in recipes:
+            data = self.edit(kind, recipe, tag_ids, ingredient_ids)
+            # Every edit is rolled back, so both updates start from the
+            # same rows.
+            with transaction.atomic():
+                with connection.execute_wrapper(counter):
+                    started = time.perf_counter()
+                    update(recipe, data)
+                    timings.append((time.perf_counter() - started) * 1000)
+                counter.flush()
+                transaction.set_rollback(True)
+        per_edit = {
+            write: counter.rows[write] / len(recipes) for write in WRITES
+        }
+        self.stdout.write(
+            f'{kind:6} {name:8} rows written per edit '
+            f'{sum(per_edit.values()):6.1f} ('
+            + ', '.join(f'{write} {per_edit[write]:.1f}'
+                        for write in WRITES)
+            + f'), statements {counter.statements / len(recipes):5.1f}, '
+            f'p50 {percentile(timings, 0.5):6.2f} ms'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            self.stdout.write('Seeding data...')
+            factory, tag_ids, ingredient_ids, recipe_ids = self.seed(options)
+            recipes = [
+                Recipe.objects.get(pk=pk) for pk in factory.random.sample(
+                    recipe_ids, min(options['edits'], len(recipe_ids))
+                )
+            ]
+            self.stdout.write(
+                f'{len(recipes)} edits of each kind over '
+                f'{len(recipe_ids)} recipes:'
+            )
+            for kind in EDITS:
+                for name, update in (('recreate', recreate), ('diff', diff)):
+                    self.measure(kind, name, update, recipes, tag_ids,
+                                 ingredient_ids)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,81 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from recipes.models import Recipe
+
+from ...metrics import percentile
+from ..factories import DISHES, FILLINGS, TEXT_WORDS
+
+
+class Command(BaseCommand):
+    help = ('Measure latency of full-text recipe search on the current '
+            'database, e.g. after generate_fixtures --recipes 1000000.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=6,
+            help='Number of recipes fetched per query, as on a page.'
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also measure the same queries with icontains.'
+        )
+
+    def queries(self, count, seed):
+        rng = random.Random(seed)
+        words = (DISHES, FILLINGS, TEXT_WORDS[20:])
+        return [
+            ' '.join(rng.choice(rng.choice(words))
+                     for _ in range(rng.randint(1, 2)))
+            for _ in range(count)
+        ]
+
+    def icontains(self, text):
+        queryset = Recipe.objects.order_by('-pub_date', '-id')
+        for word in text.split():
+            queryset = queryset.filter(
+                Q(name__icontains=word) | Q(text__icontains=word)
+            )
+        return queryset
+
+    def measure(self, name, search, queries, limit):
+        timings, matches = list(), 0
+        for text in queries:
+            started = time.perf_counter()
+            queryset = search(text)
+            list(queryset.values_list('id', flat=True)[:limit])
+            matches += queryset.count()
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'{name:10} p50 {percentile(timings, 0.5):8.1f} '
+            f'p95 {percentile(timings, 0.95):8.1f} '
+            f'p99 {percentile(timings, 0.99):8.1f} ms, '
+            f'{matches / len(queries):.0f} matches per query'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.count()
+        if not recipes:
+            raise CommandError(
+                'No recipes found, run generate_fixtures first.'
+            )
+        queries = self.queries(options['queries'], options['seed'])
+        self.stdout.write(
+            f'{len(queries)} queries on {recipes} recipes '
+            f'({connection.vendor}), page and count per query:'
+        )
+        self.measure(
+            'full-text', Recipe.objects.search, queries, options['limit']
+        )
+        if options['compare']:
+            self.measure(
+                'icontains', self.icontains, queries, options['limit']
+            )
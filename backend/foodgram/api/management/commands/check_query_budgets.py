@@ -0,0 +1,326 @@
+import base64
+import io
+import json
+import statistics
+import tempfile
+import time
+from functools import lru_cache
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from recipes.models import (CartIngredientTotal, Recipe, RecipeScore, Tag,
+                            TimelineEntry)
+from rest_framework.test import APIClient
+from users.models import CustomUser
+
+from ...counters import reconcile_counters
+from ...response_cache import recipe_cache
+from ..factories import DataFactory
+
+# name, client, (method, path[, payload]), max queries, max milliseconds,
+# and requests sent before and after every measured one to restore state.
+# Payload names refer to Command.payload, optionally with the number of
+# ingredients after a colon; creating a recipe stores its id as {created}.
+# Write budgets do not depend on the number of ingredients. Budgets
+# include the queries of the configured cache, cached responses are only
+# read and missed ones are also stored.
+BUDGETS = (
+    ('recipes-list', 'anonymous',
+     ('get', '/api/recipes/'), 11, 150, (), ()),
+    ('recipes-list-cached', 'anonymous',
+     ('get', '/api/recipes/'), 2, 50, (('get', '/api/recipes/'),), ()),
+    ('recipes-list', 'viewer',
+     ('get', '/api/recipes/'), 7, 150, (), ()),
+    ('recipes-list-cursor', 'anonymous',
+     ('get', '/api/recipes/?cursor='), 10, 150, (), ()),
+    ('recipes-list-deep-page', 'anonymous',
+     ('get', '/api/recipes/?page={last_page}'), 11, 200, (), ()),
+    ('recipes-list-tags', 'anonymous',
+     ('get', '/api/recipes/?tags={tag}&tags={other_tag}'), 17, 200, (), ()),
+    ('recipes-list-all-tags', 'anonymous',
+     ('get', '/api/recipes/?tags={tag}&tags={other_tag}&tags_match=all'),
+     12, 200, (), ()),
+    ('recipes-search', 'anonymous',
+     ('get', '/api/recipes/?search=суп с грибами'), 11, 200, (), ()),
+    ('recipes-cookable', 'anonymous',
+     ('get', '/api/recipes/cookable/?ingredients={ingredient}'
+      '&ingredients={other_ingredient}&max_missing=10'), 12, 150,
+     (('get', '/api/recipes/cookable/'),), ()),
+    ('recipes-popular', 'anonymous',
+     ('get', '/api/recipes/popular/'), 11, 150, (), ()),
+    ('recipes-popular', 'viewer',
+     ('get', '/api/recipes/popular/?tags={tag}'), 7, 150, (), ()),
+    ('recipes-feed', 'viewer',
+     ('get', '/api/recipes/feed/'), 8, 150, (), ()),
+    ('recipes-feed-cursor', 'viewer',
+     ('get', '/api/recipes/feed/?cursor='), 7, 150, (), ()),
+    ('recipes-list-author', 'anonymous',
+     ('get', '/api/recipes/?author={author}'), 12, 150, (), ()),
+    ('recipes-list-favorited', 'viewer',
+     ('get', '/api/recipes/?is_favorited=1'), 7, 150, (), ()),
+    ('recipes-list-in-cart', 'viewer',
+     ('get', '/api/recipes/?is_in_shopping_cart=1'), 7, 150, (), ()),
+    ('recipes-detail', 'anonymous',
+     ('get', '/api/recipes/{recipe}/'), 10, 100, (), ()),
+    ('recipes-detail', 'viewer',
+     ('get', '/api/recipes/{recipe}/'), 6, 100, (), ()),
+    ('recipes-favorite', 'viewer',
+     ('post', '/api/recipes/{recipe}/favorite/'), 6, 100,
+     (), (('delete', '/api/recipes/{recipe}/favorite/'),)),
+    ('recipes-delete-favorite', 'viewer',
+     ('delete', '/api/recipes/{recipe}/favorite/'), 5, 100,
+     (('post', '/api/recipes/{recipe}/favorite/'),), ()),
+    ('recipes-shopping-cart', 'viewer',
+     ('post', '/api/recipes/{recipe}/shopping_cart/'), 9, 100,
+     (), (('delete', '/api/recipes/{recipe}/shopping_cart/'),)),
+    ('recipes-delete-shopping-cart', 'viewer',
+     ('delete', '/api/recipes/{recipe}/shopping_cart/'), 9, 100,
+     (('post', '/api/recipes/{recipe}/shopping_cart/'),), ()),
+    ('recipes-create', 'viewer',
+     ('post', '/api/recipes/', 'recipe'), 31, 300,
+     (), (('delete', '/api/recipes/{created}/'),)),
+    ('recipes-update', 'viewer',
+     ('patch', '/api/recipes/{own_recipe}/', 'recipe-edit'), 25, 200,
+     (('patch', '/api/recipes/{own_recipe}/', 'recipe-alt'),), ()),
+    ('recipes-delete', 'viewer',
+     ('delete', '/api/recipes/{created}/'), 23, 200,
+     (('post', '/api/recipes/', 'recipe'),), ()),
+    ('recipes-create-30-ingredients', 'viewer',
+     ('post', '/api/recipes/', 'recipe:30'), 29, 300,
+     (), (('delete', '/api/recipes/{created}/'),)),
+    ('recipes-update-30-ingredients', 'viewer',
+     ('patch', '/api/recipes/{own_recipe}/', 'recipe-edit:30'), 25, 200,
+     (('patch', '/api/recipes/{own_recipe}/', 'recipe-alt'),), ()),
+    ('recipes-delete-30-ingredients', 'viewer',
+     ('delete', '/api/recipes/{created}/'), 23, 200,
+     (('post', '/api/recipes/', 'recipe:30'),), ()),
+    ('recipes-image', 'viewer',
+     ('put', '/api/recipes/{own_recipe}/image/', 'image'), 18, 300,
+     (), ()),
+    ('recipes-download-shopping-cart', 'viewer',
+     ('get', '/api/recipes/download_shopping_cart/'), 1, 200, (), ()),
+    ('users-subscriptions', 'viewer',
+     ('get', '/api/users/subscriptions/'), 3, 150, (), ()),
+    ('users-subscribe', 'viewer',
+     ('post', '/api/users/{new_author}/subscribe/'), 10, 150,
+     (), (('delete', '/api/users/{new_author}/subscribe/'),)),
+    ('users-unsubscribe', 'viewer',
+     ('delete', '/api/users/{new_author}/subscribe/'), 6, 100,
+     (('post', '/api/users/{new_author}/subscribe/'),), ()),
+    ('users-list', 'anonymous',
+     ('get', '/api/users/'), 1, 100, (), ()),
+    ('users-detail', 'viewer',
+     ('get', '/api/users/{author}/'), 2, 100, (), ()),
+    ('users-me', 'viewer',
+     ('get', '/api/users/me/'), 1, 100, (), ()),
+    ('tags-list', 'anonymous',
+     ('get', '/api/tags/'), 1, 50, (), ()),
+    ('tags-detail', 'anonymous',
+     ('get', '/api/tags/{tag_id}/'), 1, 50, (), ()),
+    ('ingredients-search', 'anonymous',
+     ('get', '/api/ingredients/?name=ингредиент 1'), 7, 100, (), ()),
+    ('ingredients-detail', 'anonymous',
+     ('get', '/api/ingredients/{ingredient}/'), 1, 50, (), ()),
+)
+
+
+@lru_cache(maxsize=None)
+def png_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway test database and check query counts and '
+            'response times of API endpoints against their budgets.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Number of measured requests per endpoint.'
+        )
+        parser.add_argument(
+            '--time-factor',
+            type=float,
+            default=1.0,
+            help='Multiplier for time budgets on slower machines.'
+        )
+        parser.add_argument(
+            '--report',
+            help='Path of the JSON report to write.'
+        )
+
+    def handle(self, *args, **options):
+        # The configured cache is kept: its queries count against budgets.
+        media_root = tempfile.TemporaryDirectory()
+        with media_root, override_settings(
+                METRICS_SAMPLE_RATE=0, IMAGE_WORKERS=0,
+                MEDIA_ROOT=media_root.name):
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                self.stdout.write('Seeding data...')
+                started = time.monotonic()
+                params, viewer, dataset = self.seed(options)
+                self.stdout.write(
+                    f'Seeded in {time.monotonic() - started:.1f}s.'
+                )
+                results = self.measure(params, viewer, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        report = {
+            'vendor': connection.vendor,
+            'seed': options['seed'],
+            'dataset': dataset,
+            'endpoints': results,
+        }
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2, sort_keys=True,
+                          ensure_ascii=False)
+        failed = [name for name, result in results.items()
+                  if not result['ok']]
+        if failed:
+            raise CommandError(
+                f'{len(failed)} endpoints are over budget: '
+                f'{", ".join(failed)}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'All {len(results)} endpoints are within budget.'
+        ))
+
+    def seed(self, options):
+        factory = DataFactory(seed=options['seed'])
+        tag_ids = factory.tags(10)
+        ingredient_ids = factory.ingredients(options['ingredients'])
+        user_ids = factory.users(options['users'])
+        viewer_id, other_ids = user_ids[0], user_ids[1:]
+        recipe_ids = factory.recipes(
+            other_ids, options['recipes'], tag_ids, ingredient_ids
+        )
+        own_recipe_id, = factory.recipes(
+            [viewer_id], 1, tag_ids, ingredient_ids
+        )
+        factory.follows([viewer_id], other_ids, (20, 20))
+        factory.follows(other_ids, user_ids, (0, 10))
+        factory.favorites([viewer_id], recipe_ids[1:], (30, 30))
+        factory.favorites(other_ids, recipe_ids, (0, 20))
+        factory.carts([viewer_id], recipe_ids[1:], (10, 10))
+        factory.carts(other_ids, recipe_ids, (0, 5))
+        CartIngredientTotal.objects.rebuild()
+        reconcile_counters()
+        RecipeScore.objects.refresh(full=True)
+        TimelineEntry.objects.rebuild()
+        recipe = Recipe.objects.get(pk=recipe_ids[0])
+        tag, other_tag = Tag.objects.filter(pk__in=tag_ids[:2])
+        new_author = CustomUser.objects.filter(pk__in=other_ids).exclude(
+            following__user_id=viewer_id
+        ).order_by('pk').first()
+        params = {
+            'recipe': recipe.id,
+            'author': recipe.author_id,
+            'tag': tag.slug,
+            'tag_id': tag.id,
+            'own_recipe': own_recipe_id,
+            'new_author': new_author.id,
+            'other_tag': other_tag.slug,
+            'ingredient': ingredient_ids[0],
+            'other_ingredient': ingredient_ids[1],
+            'ingredients': ingredient_ids[:30],
+            'last_page': (len(recipe_ids) - 1) // 6 + 1,
+        }
+        dataset = {
+            'users': len(user_ids),
+            'recipes': len(recipe_ids),
+            'ingredients': len(ingredient_ids),
+            'tags': len(tag_ids),
+        }
+        return params, CustomUser.objects.get(pk=viewer_id), dataset
+
+    def payload(self, name, params):
+        name, _, count = name.partition(':')
+        recipe = {
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 100}
+                for ingredient_id in params['ingredients'][:int(count or 2)]
+            ],
+            'tags': [params['tag_id']],
+            'name': 'Суп с грибами',
+            'text': 'Сварить грибы, добавить остальные ингредиенты.',
+            'cooking_time': 30,
+        }
+        if name == 'recipe':
+            return {'data': {**recipe, 'image': 'data:image/png;base64,'
+                             + base64.b64encode(png_image()).decode()},
+                    'format': 'json'}
+        if name == 'recipe-edit':
+            for ingredient in recipe['ingredients']:
+                ingredient['amount'] = 50
+            return {'data': recipe, 'format': 'json'}
+        if name == 'recipe-alt':
+            recipe['ingredients'] = [{'id': params['ingredient'],
+                                      'amount': 200}]
+            return {'data': recipe, 'format': 'json'}
+        image = SimpleUploadedFile('image.png', png_image(), 'image/png')
+        return {'data': {'image': image}, 'format': 'multipart'}
+
+    def request(self, client, params, method, path, payload=None):
+        kwargs = self.payload(payload, params) if payload else {}
+        response = getattr(client, method)(path.format(**params), **kwargs)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if path == '/api/recipes/' and response.status_code == 201:
+            params['created'] = response.data['id']
+        return response
+
+    def measure(self, params, viewer, options):
+        clients = {'anonymous': APIClient(), 'viewer': APIClient()}
+        clients['viewer'].force_authenticate(viewer)
+        results = dict()
+        for (name, role, step, max_queries, max_ms,
+             before, after) in BUDGETS:
+            client = clients[role]
+            queries, timings, statuses = list(), list(), set()
+            for _ in range(options['repeat']):
+                recipe_cache.bump()
+                for extra in before:
+                    self.request(client, params, *extra)
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = self.request(client, params, *step)
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(context))
+                statuses.add(response.status_code)
+                for extra in after:
+                    self.request(client, params, *extra)
+            max_ms *= options['time_factor']
+            result = {
+                'status': sorted(statuses),
+                'queries': max(queries),
+                'max_queries': max_queries,
+                'time_ms': round(statistics.median(timings), 2),
+                'max_time_ms': max_ms,
+            }
+            result['ok'] = (
+                all(200 <= status < 300 for status in statuses)
+                and result['queries'] <= max_queries
+                and result['time_ms'] <= max_ms
+            )
+            results[f'{name}:{role}'] = result
+            self.stdout.write(
+                f'{"ok  " if result["ok"] else "FAIL"} {name}:{role} '
+                f'{result["queries"]}/{max_queries} queries, '
+                f'{result["time_ms"]:.1f}/{max_ms:.0f} ms'
+            )
+        return results
@@ -0,0 +1,112 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef
+from recipes.models import (Cart, Favorite, IngredientAmount, Recipe,
+                            RecipeScore, Tag, TimelineEntry)
+from users.models import CustomUser, Follow
+
+from ...recipe_index import cookable_in_db
+
+GUARDED_MODELS = (
+    Recipe, Favorite, Cart, Follow, IngredientAmount, RecipeScore,
+    TimelineEntry
+)
+
+
+def key_queries(user, recipe, tag):
+    """Querysets behind the recipe feed filters, flags and follows."""
+    recipes = Recipe.objects.order_by('-pub_date', '-id')
+    return (
+        ('recipes-list', recipes[:6]),
+        ('recipes-by-author', recipes.filter(author=recipe.author_id)[:6]),
+        ('recipes-by-tag', recipes.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag=tag)
+        ))[:6]),
+        ('recipes-search', Recipe.objects.search(recipe.name)[:6]),
+        ('recipes-cookable', cookable_in_db(
+            recipe.recipe_amount.values_list('ingredient_id', flat=True), 2
+        )[:6]),
+        ('recipes-popular', Recipe.objects.annotate(
+            popularity=F('score__score')
+        ).filter(popularity__isnull=False).order_by(
+            '-popularity', '-id'
+        )[:6]),
+        ('recipes-feed', TimelineEntry.objects.filter(user=user)[:6]),
+        ('recipes-feed-pull', recipes.filter(
+            author=recipe.author_id, pub_date__gt=recipe.pub_date
+        )[:6]),
+        ('recipes-favorited', recipes.filter(favorite__user=user)[:6]),
+        ('recipes-in-cart', recipes.filter(cart__user=user)[:6]),
+        ('favorite-flag',
+         Favorite.objects.filter(user=user, recipe=recipe)),
+        ('cart-flag', Cart.objects.filter(user=user, recipe=recipe)),
+        ('recipe-cart-users',
+         Cart.objects.filter(recipe=recipe).values('user_id')),
+        ('recipe-favorite-users',
+         Favorite.objects.filter(recipe=recipe).values('user_id')),
+        ('recipe-ingredients',
+         IngredientAmount.objects.filter(recipe=recipe)),
+        ('follows-by-user', Follow.objects.filter(user=user)),
+        ('follow-pair',
+         Follow.objects.filter(user=user, author=recipe.author_id)),
+    )
+
+
+def sequential_scans(plan):
+    """Return guarded tables the plan reads without an index."""
+    tables = {model._meta.db_table for model in GUARDED_MODELS}
+    if connection.vendor == 'postgresql':
+        found = re.findall(r'Seq Scan on (\w+)', plan)
+    elif connection.vendor == 'sqlite':
+        found = re.findall(r'\bSCAN (\w+)(?: AS \w+)?\s*$', plan, re.M)
+    else:
+        found = list()
+    return sorted(tables.intersection(found))
+
+
+class Command(BaseCommand):
+    help = ('Run EXPLAIN for the key recipe, favorite, cart and follow '
+            'queries and fail when one scans a large table sequentially.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print the plan of every query.'
+        )
+
+    def handle(self, *args, **options):
+        user = CustomUser.objects.filter(follower__isnull=False).first()
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        tag = Tag.objects.first()
+        if user is None or recipe is None or tag is None:
+            raise CommandError(
+                'Users with follows, recipes and tags are required, '
+                'run generate_fixtures first.'
+            )
+        failed = list()
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for name, queryset in key_queries(user, recipe, tag):
+                plan = queryset.explain()
+                scans = sequential_scans(plan)
+                if options['verbose_plans']:
+                    self.stdout.write(f'{name}:\n{plan}\n')
+                if scans:
+                    failed.append(f'{name} ({", ".join(scans)})')
+                    self.stdout.write(self.style.ERROR(
+                        f'{name}: sequential scan of {", ".join(scans)}'
+                    ))
+                else:
+                    self.stdout.write(f'{name}: ok')
+        if failed:
+            raise CommandError(
+                f'Sequential scans in {len(failed)} queries: '
+                f'{"; ".join(failed)}'
+            )
+        self.stdout.write(self.style.SUCCESS('All key queries use indexes.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from ...response_cache import recipe_cache
+
+
+class Command(BaseCommand):
+    help = ('Drop all cached recipe responses. Hit/miss counters are kept '
+            'per worker and shown by /api/_metrics/.')
+
+    def handle(self, *args, **options):
+        recipe_cache.bump()
+        self.stdout.write('Cached recipe responses dropped.')
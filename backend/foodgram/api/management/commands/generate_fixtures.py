@@ -0,0 +1,138 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import CartIngredientTotal, Ingredient, Tag, TimelineEntry
+from users.models import CustomUser
+
+from ...counters import reconcile_counters
+from ...filters import invalidate_tag_map
+from ...ingredient_index import ingredient_index
+from ...recipe_index import recipe_index
+from ...response_cache import recipe_cache
+from ..factories import DataFactory
+
+
+class Command(BaseCommand):
+    help = ('Generate users, recipes, favorites, carts and follows '
+            'for load and scale testing.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--authors',
+            type=int,
+            help='Number of users who publish recipes (users / 10 by default).'
+        )
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=10,
+            help='Mean number of favorite recipes per user.'
+        )
+        parser.add_argument(
+            '--carts',
+            type=int,
+            default=3,
+            help='Mean number of recipes in a shopping cart.'
+        )
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=5,
+            help='Mean number of followed authors per user.'
+        )
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=10,
+            help='Number of tags to create when there are none.'
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=2000,
+            help='Number of ingredients to create when there are none.'
+        )
+        parser.add_argument(
+            '--power',
+            type=float,
+            default=1.1,
+            help='Exponent of the power law for authors and popularity.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--prefix',
+            default='user',
+            help='Prefix of generated usernames and emails.'
+        )
+
+    def stage(self, name, create):
+        started = time.monotonic()
+        result = create()
+        count = result if isinstance(result, int) else len(result)
+        self.stdout.write(
+            f'{name}: {count} rows in {time.monotonic() - started:.1f}s'
+        )
+        return result
+
+    def rebuild_cart_totals(self):
+        CartIngredientTotal.objects.rebuild()
+        return CartIngredientTotal.objects.count()
+
+    def handle(self, *args, **options):
+        factory = DataFactory(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            power=options['power']
+        )
+        prefix = options['prefix']
+        started = time.monotonic()
+        with transaction.atomic():
+            tag_ids = list(Tag.objects.values_list('id', flat=True))
+            if not tag_ids:
+                tag_ids = self.stage(
+                    'Tags', lambda: factory.tags(options['tags'])
+                )
+                transaction.on_commit(invalidate_tag_map)
+            ingredient_ids = list(
+                Ingredient.objects.values_list('id', flat=True)
+            )
+            if not ingredient_ids:
+                ingredient_ids = self.stage(
+                    'Ingredients',
+                    lambda: factory.ingredients(options['ingredients'])
+                )
+                transaction.on_commit(ingredient_index.invalidate)
+            start = CustomUser.objects.filter(
+                username__startswith=prefix
+            ).count()
+            user_ids = self.stage('Users', lambda: factory.users(
+                options['users'], prefix=prefix, start=start
+            ))
+            authors = options['authors'] or max(1, len(user_ids) // 10)
+            author_ids = user_ids[:authors]
+            recipe_ids = self.stage('Recipes', lambda: factory.recipes(
+                author_ids, options['recipes'], tag_ids, ingredient_ids
+            ))
+            self.stage('Follows', lambda: factory.follows(
+                user_ids, author_ids, options['follows']
+            ))
+            self.stage('Favorites', lambda: factory.favorites(
+                user_ids, recipe_ids, options['favorites']
+            ))
+            self.stage('Carts', lambda: factory.carts(
+                user_ids, recipe_ids, options['carts']
+            ))
+            self.stage('Cart totals', self.rebuild_cart_totals)
+            self.stage(
+                'Counters', lambda: sum(reconcile_counters().values())
+            )
+            self.stage('Timelines', TimelineEntry.objects.rebuild)
+            transaction.on_commit(recipe_cache.bump)
+            transaction.on_commit(recipe_index.invalidate)
+        self.stdout.write(self.style.SUCCESS(
+            f'Fixtures generated in {time.monotonic() - started:.1f}s.'
+        ))
@@ -1,16 +1,168 @@
 import csv
+import json
+import os
+import re
+import time
+from collections import defaultdict
 
-from django.core.management.base import BaseCommand
-from recipes.models import Ingredient
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import Ingredient, Recipe
+
+from ...ingredient_index import ingredient_index
+from ...response_cache import recipe_cache
+
+DEFAULT_PATH = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+JSON_SEPARATORS = re.compile(r'[\s,\[]*')
+
+
+def iter_json_array(file, chunk_size=64 * 1024):
+    """Yield items of a JSON array read from the file chunk by chunk."""
+    decoder = json.JSONDecoder()
+    buffer, position = '', 0
+    while True:
+        chunk = file.read(chunk_size)
+        buffer, position = buffer[position:] + chunk, 0
+        while True:
+            position = JSON_SEPARATORS.match(buffer, position).end()
+            if buffer.startswith(']', position):
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item
+        if not chunk:
+            raise CommandError('The JSON file is not a complete array.')
 
 
 class Command(BaseCommand):
+    help = 'Load ingredients from a CSV or JSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=DEFAULT_PATH,
+            help='CSV (name,measurement_unit) or JSON file with ingredients.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of ingredients written per query.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be loaded without writing anything.'
+        )
+        parser.add_argument(
+            '--update-units',
+            action='store_true',
+            help=('Change the unit of an existing ingredient when the file '
+                  'lists its name with a single different unit.')
+        )
+
+    def read_rows(self, path):
+        extension = os.path.splitext(path)[1].lower()
+        with open(path, encoding='utf-8') as file:
+            if extension == '.csv':
+                for name, measurement_unit in csv.reader(file):
+                    yield name.strip(), measurement_unit.strip()
+            elif extension == '.json':
+                for item in iter_json_array(file):
+                    yield (item['name'].strip(),
+                           item['measurement_unit'].strip())
+            else:
+                raise CommandError(f'Unsupported file format: {extension}')
+
+    def read_batches(self, path, batch_size):
+        batch = list()
+        for row in self.read_rows(path):
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield batch
+                batch = list()
+        if batch:
+            yield batch
+
+    def create_batch(self, rows):
+        """Create new ingredients of the batch; return (rows, created)."""
+        rows = list(dict.fromkeys(rows))
+        existing = set(Ingredient.objects.filter(
+            name__in={name for name, _ in rows}
+        ).values_list('name', 'measurement_unit'))
+        new = [row for row in rows if row not in existing]
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=measurement_unit)
+             for name, measurement_unit in new],
+            ignore_conflicts=True
+        )
+        return len(rows), len(new)
+
+    def changed_units(self, units, names):
+        stored = defaultdict(list)
+        for ingredient in Ingredient.objects.filter(name__in=names):
+            stored[ingredient.name].append(ingredient)
+        for name, ingredients in stored.items():
+            if len(ingredients) != 1:
+                continue
+            ingredient, = ingredients
+            if ingredient.measurement_unit != units[name]:
+                ingredient.measurement_unit = units[name]
+                yield ingredient
+
+    def update_units(self, path, batch_size):
+        """
+        Give a single unit listed in the file to ingredients stored with
+        another one. Only names and units are kept in memory, one pass.
+        """
+        file_units = defaultdict(set)
+        for name, measurement_unit in self.read_rows(path):
+            file_units[name].add(measurement_unit)
+        units = {
+            name: next(iter(found))
+            for name, found in file_units.items() if len(found) == 1
+        }
+        names, updated = list(units), 0
+        for start in range(0, len(names), batch_size):
+            changed = list(self.changed_units(
+                units, names[start:start + batch_size]
+            ))
+            Ingredient.objects.bulk_update(changed, ['measurement_unit'])
+            Recipe.objects.filter(
+                recipe_amount__ingredient__in=changed
+            ).touch()
+            updated += len(changed)
+        return updated
+
     def handle(self, *args, **options):
-        with open('data/ingredients.csv') as csvfile:
-            reader = csv.reader(csvfile)
-            for row in reader:
-                name, measurement_unit = row
-                Ingredient.objects.get_or_create(
-                    name=name,
-                    measurement_unit=measurement_unit,
+        batch_size = options['batch_size']
+        started = time.monotonic()
+        total = created = 0
+        with transaction.atomic():
+            updated = (
+                self.update_units(options['path'], batch_size)
+                if options['update_units'] else 0
+            )
+            for batch in self.read_batches(options['path'], batch_size):
+                rows, new = self.create_batch(batch)
+                total += rows
+                created += new
+                self.stdout.write(
+                    f'{total} rows read, {created} ingredients written'
                 )
+            if options['dry_run']:
+                transaction.set_rollback(True)
+            else:
+                transaction.on_commit(ingredient_index.invalidate)
+                transaction.on_commit(recipe_cache.bump)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would load" if options["dry_run"] else "Loaded"} '
+            f'{total} rows in {elapsed:.2f}s '
+            f'({total / elapsed if elapsed else 0:.0f} rows/s): '
+            f'{created} created, {updated} updated, '
+            f'{total - created - updated} already present.'
+        ))
@@ -0,0 +1,309 @@
+import base64
+import io
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from users.models import CustomUser
+
+from ...metrics import percentile
+from ..factories import DISHES
+
+# Share of every scenario in the traffic mix.
+SCENARIOS = (
+    ('browse', 27),
+    ('cookable', 3),
+    ('popular', 5),
+    ('feed', 5),
+    ('detail', 15),
+    ('autocomplete', 15),
+    ('favorite', 10),
+    ('shopping_cart', 8),
+    ('download', 5),
+    ('subscriptions', 5),
+    ('create', 2),
+)
+
+
+def png_data_url():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class Session:
+    """Worker replaying scenarios as one user; records every request."""
+
+    def __init__(self, command, token, seed):
+        self.command = command
+        self.token = token
+        self.random = random.Random(seed)
+
+    def request(self, name, method, path, params=None, data=None,
+                anonymous=False):
+        url = self.command.url + path
+        if params:
+            url = f'{url}?{urlencode(params, doseq=True)}'
+        headers = {'Accept': 'application/json'}
+        if not anonymous:
+            headers['Authorization'] = f'Token {self.token}'
+        if data is not None:
+            data = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+        request = Request(url, data=data, headers=headers, method=method)
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=self.command.timeout) as response:
+                body = response.read()
+                status = response.status
+        except HTTPError as error:
+            body, status = error.read(), error.code
+        except (URLError, OSError):
+            body, status = b'', 0
+        self.command.record(
+            f'{method} {name}', time.perf_counter() - started, status
+        )
+        return status, body
+
+    def browse(self):
+        params = {'page': self.random.randint(1, 20)}
+        if self.random.random() < 0.5:
+            params['tags'] = self.random.sample(
+                self.command.tags, min(2, len(self.command.tags)))
+        if self.random.random() < 0.2:
+            params['search'] = self.random.choice(DISHES)
+        self.request('recipe-list', 'GET', '/api/recipes/', params,
+                     anonymous=True)
+
+    def popular(self):
+        params = {'page': self.random.randint(1, 5)}
+        if self.random.random() < 0.5:
+            params['tags'] = self.random.choice(self.command.tags)
+        self.request('recipe-popular', 'GET', '/api/recipes/popular/',
+                     params, anonymous=True)
+
+    def feed(self):
+        params = {'cursor': ''} if self.random.random() < 0.5 else {
+            'page': self.random.randint(1, 3)}
+        self.request('recipe-feed', 'GET', '/api/recipes/feed/', params)
+
+    def cookable(self):
+        params = {
+            'ingredients': self.random.sample(
+                self.command.ingredient_ids[:50],
+                min(10, len(self.command.ingredient_ids))),
+            'max_missing': self.random.randint(0, 3),
+        }
+        self.request('recipe-cookable', 'GET', '/api/recipes/cookable/',
+                     params, anonymous=self.random.random() < 0.5)
+
+    def detail(self):
+        recipe = self.random.choice(self.command.recipes)
+        self.request('recipe-detail', 'GET', f'/api/recipes/{recipe}/',
+                     anonymous=self.random.random() < 0.5)
+
+    def autocomplete(self):
+        name = self.random.choice(self.command.ingredients)
+        for length in range(1, min(4, len(name)) + 1):
+            self.request('ingredient-list', 'GET', '/api/ingredients/',
+                         {'name': name[:length]}, anonymous=True)
+
+    def toggle(self, action):
+        path = f'/api/recipes/{self.random.choice(self.command.recipes)}/'
+        status, _ = self.request(
+            f'recipe-{action}', 'POST', f'{path}{action}/'
+        )
+        if status == 201:
+            self.request(f'recipe-{action}', 'DELETE', f'{path}{action}/')
+
+    def favorite(self):
+        self.toggle('favorite')
+
+    def shopping_cart(self):
+        self.toggle('shopping_cart')
+
+    def download(self):
+        self.request('recipe-download-shopping-cart', 'GET',
+                     '/api/recipes/download_shopping_cart/',
+                     {'format': self.random.choice(('txt', 'csv', 'json'))})
+
+    def subscriptions(self):
+        self.request('customuser-subscriptions', 'GET',
+                     '/api/users/subscriptions/')
+
+    def create(self):
+        ingredients = self.random.sample(
+            self.command.ingredient_ids,
+            min(5, len(self.command.ingredient_ids)))
+        data = {
+            'name': f'Нагрузочный рецепт {self.random.random()}',
+            'text': 'Создан нагрузочным тестом.',
+            'cooking_time': self.random.randint(1, 120),
+            'tags': self.random.sample(self.command.tag_ids, 1),
+            'ingredients': [
+                {'id': pk, 'amount': self.random.randint(1, 300)}
+                for pk in ingredients
+            ],
+            'image': self.command.image,
+        }
+        status, body = self.request(
+            'recipe-list', 'POST', '/api/recipes/', data=data
+        )
+        if status == 201:
+            recipe = json.loads(body)['id']
+            self.request('recipe-detail', 'DELETE', f'/api/recipes/{recipe}/')
+
+
+class Command(BaseCommand):
+    help = ('Replay the API traffic mix against a running backend and '
+            'report throughput and latency percentiles per endpoint.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Seconds to run.'
+        )
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--report', help='Path of the JSON report.')
+        parser.add_argument(
+            '--baseline',
+            help='JSON report to compare with; the run fails on regressions.'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.2,
+            help='Allowed relative growth of p95 latency over the baseline.'
+        )
+
+    def record(self, name, elapsed, status):
+        with self.lock:
+            self.results[name].append((elapsed, status))
+
+    def prepare(self, concurrency):
+        users = list(CustomUser.objects.order_by('id')[:concurrency])
+        if not users:
+            raise CommandError(
+                'No users found, run generate_fixtures first.'
+            )
+        self.tokens = [
+            Token.objects.get_or_create(user=user)[0].key for user in users
+        ]
+        self.recipes = list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True)[:1000]
+        )
+        self.tags = list(Tag.objects.values_list('slug', flat=True))
+        self.tag_ids = list(Tag.objects.values_list('id', flat=True))
+        ingredients = list(
+            Ingredient.objects.values_list('id', 'name')[:1000]
+        )
+        self.ingredient_ids = [pk for pk, _ in ingredients]
+        self.ingredients = [name for _, name in ingredients]
+        if not self.recipes or not self.tags or not self.ingredients:
+            raise CommandError(
+                'Recipes, tags and ingredients are required, '
+                'run generate_fixtures first.'
+            )
+        self.image = png_data_url()
+
+    def work(self, session, deadline):
+        names, weights = zip(*SCENARIOS)
+        while time.monotonic() < deadline:
+            scenario, = session.random.choices(names, weights)
+            getattr(session, scenario)()
+
+    def summarize(self, elapsed):
+        summary = dict()
+        for name, samples in sorted(self.results.items()):
+            timings = [sample[0] * 1000 for sample in samples]
+            summary[name] = {
+                'requests': len(samples),
+                'errors': sum(
+                    1 for _, status in samples if not 0 < status < 500),
+                'rps': round(len(samples) / elapsed, 2),
+                **{
+                    key: round(percentile(timings, share), 2)
+                    for key, share in (
+                        ('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+                },
+            }
+        return summary
+
+    def compare(self, summary, baseline, threshold):
+        regressions = list()
+        for name, result in summary.items():
+            expected = baseline.get(name)
+            if expected is None:
+                continue
+            if result['p95'] > expected['p95'] * (1 + threshold):
+                regressions.append(
+                    f'{name}: p95 {result["p95"]} ms, '
+                    f'baseline {expected["p95"]} ms'
+                )
+            if result['errors'] > expected['errors']:
+                regressions.append(
+                    f'{name}: {result["errors"]} errors, '
+                    f'baseline {expected["errors"]}'
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        self.url = options['url'].rstrip('/')
+        self.timeout = options['timeout']
+        self.lock = threading.Lock()
+        self.results = defaultdict(list)
+        self.prepare(options['concurrency'])
+        deadline = time.monotonic() + options['duration']
+        workers = [
+            threading.Thread(target=self.work, args=(
+                Session(self, self.tokens[number % len(self.tokens)],
+                        options['seed'] + number),
+                deadline
+            ))
+            for number in range(options['concurrency'])
+        ]
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+        summary = self.summarize(elapsed)
+        total = sum(result['requests'] for result in summary.values())
+        self.stdout.write(f'{total} requests in {elapsed:.1f}s, '
+                          f'{total / elapsed:.1f} requests/s')
+        for name, result in summary.items():
+            self.stdout.write(
+                f'{name:45} {result["requests"]:6} req '
+                f'{result["rps"]:8.1f}/s p50 {result["p50"]:8.1f} '
+                f'p95 {result["p95"]:8.1f} p99 {result["p99"]:8.1f} ms '
+                f'{result["errors"]} errors'
+            )
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as file:
+                json.dump(summary, file, indent=2, sort_keys=True)
+        if not options['baseline']:
+            return
+        with open(options['baseline'], encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = self.compare(summary, baseline, options['threshold'])
+        if regressions:
+            raise CommandError(
+                'Latency regressions:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import CartIngredientTotal
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify shopping cart ingredient totals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare stored totals with carts, do not rebuild.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            with transaction.atomic():
+                CartIngredientTotal.objects.rebuild()
+            self.stdout.write(self.style.SUCCESS('Cart totals rebuilt.'))
+            return
+        expected = CartIngredientTotal.objects.computed()
+        stored = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total
+            in CartIngredientTotal.objects.values_list(
+                'user_id', 'ingredient_id', 'total').iterator()
+        }
+        mismatched = [
+            key for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        ]
+        if mismatched:
+            raise CommandError(
+                f'{len(mismatched)} cart totals are out of sync, '
+                f'run rebuild_cart_totals to repair them.'
+            )
+        self.stdout.write(self.style.SUCCESS('Cart totals are consistent.'))
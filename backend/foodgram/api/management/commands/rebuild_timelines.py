@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = ('Recompute subscription feeds of all users from their follows '
+            'and the latest recipes of followed authors.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with transaction.atomic():
+            entries = TimelineEntry.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt timelines with {entries} entries '
+            f'in {time.monotonic() - started:.1f}s.'
+        ))
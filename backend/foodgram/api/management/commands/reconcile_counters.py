@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ...counters import reconcile_counters, stale_counters
+
+
+class Command(BaseCommand):
+    help = ('Repair or verify favorite, cart, recipe and follower counters of '
+            'recipes and users.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only count rows with drifted counters, do not repair.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            with transaction.atomic():
+                fixed = reconcile_counters()
+            for counter, rows in fixed.items():
+                self.stdout.write(f'{counter}: {rows} rows repaired')
+            self.stdout.write(self.style.SUCCESS('Counters reconciled.'))
+            return
+        stale = {
+            counter: rows for counter, rows in stale_counters().items()
+            if rows
+        }
+        if stale:
+            raise CommandError(
+                'Counters are out of sync: ' + ', '.join(
+                    f'{counter} in {rows} rows'
+                    for counter, rows in stale.items()
+                ) + '; run reconcile_counters to repair them.'
+            )
+        self.stdout.write(self.style.SUCCESS('Counters are consistent.'))
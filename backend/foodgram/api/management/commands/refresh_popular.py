@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import RecipeScore
+
+from ...response_cache import recipe_cache
+
+
+class Command(BaseCommand):
+    help = ('Add favorites and cart additions made since the last run to '
+            'popularity scores of recipes, or recompute them all.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help=('Recompute all scores; also drops removed favorites and '
+                  'carts. Required after changing POPULAR_HALF_LIFE_DAYS.')
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Keep refreshing every given number of seconds.'
+        )
+
+    def refresh(self, full):
+        started = time.monotonic()
+        with transaction.atomic():
+            updated = RecipeScore.objects.refresh(full=full)
+            if updated:
+                transaction.on_commit(recipe_cache.bump)
+        self.stdout.write(
+            f'{"Recomputed" if full else "Updated"} scores of {updated} '
+            f'recipes in {time.monotonic() - started:.2f}s.'
+        )
+
+    def handle(self, *args, **options):
+        self.refresh(options['full'])
+        while options['interval']:
+            time.sleep(options['interval'])
+            self.refresh(False)
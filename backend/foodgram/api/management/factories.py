@@ -0,0 +1,217 @@
+import bisect
+import itertools
+import random
+from functools import lru_cache
+
+from django.contrib.auth.hashers import make_password
+from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
+                            Recipe, Tag)
+from users.models import CustomUser, Follow
+
+DEFAULT_PASSWORD = 'foodgram-password'
+
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+
+DISHES = (
+    'суп', 'салат', 'пирог', 'омлет', 'каша', 'рагу', 'запеканка', 'паста',
+    'плов', 'блины', 'котлеты', 'жаркое', 'пицца', 'ризотто', 'лазанья',
+    'борщ', 'солянка', 'щи', 'окрошка', 'шашлык', 'вареники', 'пельмени',
+    'оладьи', 'сырники', 'голубцы', 'гуляш', 'крем-суп', 'тарт', 'киш',
+    'маффины',
+)
+
+FILLINGS = (
+    'курицей', 'грибами', 'сыром', 'говядиной', 'рыбой', 'овощами',
+    'картофелем', 'рисом', 'тыквой', 'яблоками', 'творогом', 'капустой',
+    'фасолью', 'креветками', 'шпинатом', 'индейкой', 'свининой', 'лососем',
+    'баклажанами', 'кабачками', 'вишней', 'черникой', 'беконом', 'нутом',
+    'чечевицей', 'брокколи', 'томатами', 'перцем', 'сметаной', 'орехами',
+)
+
+# Words of recipe descriptions, the most frequent first.
+TEXT_WORDS = (
+    'и', 'в', 'до', 'минут', 'добавить', 'на', 'с', 'нарезать', 'готовности',
+    'перемешать', 'обжарить', 'посолить', 'поперчить', 'сковороде', 'огне',
+    'варить', 'духовке', 'градусах', 'соль', 'масло', 'лук', 'морковь',
+    'чеснок', 'зелень', 'сливки', 'мука', 'яйца', 'молоко', 'сахар',
+    'запекать', 'тушить', 'остудить', 'подавать', 'горячим', 'кубиками',
+    'соломкой', 'кольцами', 'мелко', 'натереть', 'тёрке', 'взбить',
+    'разогреть', 'вскипятить', 'процедить', 'обсушить', 'замариновать',
+    'влить', 'бульон', 'специи', 'паприку', 'тимьян', 'розмарин', 'лимонный',
+    'сок', 'золотистой', 'корочки', 'среднем', 'медленном', 'крышкой',
+    'выложить', 'форму', 'смазанную', 'посыпать', 'украсить', 'листьями',
+    'базилика', 'петрушки', 'укропа', 'кинзы', 'мяты',
+)
+
+
+@lru_cache(maxsize=None)
+def zipf_cum_weights(count, power):
+    """Cumulative Zipf weights: the n-th item is chosen ~ 1 / n ** power."""
+    return list(itertools.accumulate(
+        1 / rank ** power for rank in range(1, count + 1)
+    ))
+
+
+class DataFactory:
+    """
+    Deterministic generator of users, recipes and relations between
+    them. Rows are built and written with bulk_create chunk by chunk,
+    so only ids of created users and recipes are kept in memory.
+
+    Authors, tags, ingredients and favorite recipes are picked with a
+    power-law distribution: the first items of a list are the popular
+    ones. Numbers of relations per user are either drawn uniformly from
+    a ``(low, high)`` range or heavy-tailed around an ``int`` mean.
+    """
+
+    def __init__(self, seed=0, batch_size=1000, power=1.1):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.power = power
+        self.password = make_password(DEFAULT_PASSWORD)
+
+    def bulk_create(self, model, objects, **kwargs):
+        """Write objects from any iterable in chunks, return their ids."""
+        ids = list()
+        objects = iter(objects)
+        while True:
+            chunk = list(itertools.islice(objects, self.batch_size))
+            if not chunk:
+                return ids
+            created = model.objects.bulk_create(chunk, **kwargs)
+            ids.extend(obj.pk for obj in created)
+
+    def popular(self, items, count):
+        """Return up to ``count`` distinct items, favoring the first."""
+        count = min(count, len(items))
+        if count * 2 > len(items):
+            return self.random.sample(items, count)
+        cum_weights = zipf_cum_weights(len(items), self.power)
+        chosen = dict()
+        for _ in range(count * 4):
+            if len(chosen) == count:
+                break
+            index = bisect.bisect(
+                cum_weights, self.random.random() * cum_weights[-1]
+            )
+            chosen[min(index, len(items) - 1)] = None
+        while len(chosen) < count:
+            chosen[self.random.randrange(len(items))] = None
+        return [items[index] for index in chosen]
+
+    def count(self, per_user, limit):
+        if isinstance(per_user, tuple):
+            count = self.random.randint(*per_user)
+        else:
+            count = int(per_user * (self.random.paretovariate(1.5) - 1) / 2)
+        return min(count, limit)
+
+    def tags(self, count, start=0):
+        return self.bulk_create(Tag, (
+            Tag(name=f'Тег {number}', color=f'#{number:06X}',
+                slug=f'tag-{number}')
+            for number in range(start, start + count)
+        ))
+
+    def ingredients(self, count, start=0):
+        return self.bulk_create(Ingredient, (
+            Ingredient(name=f'ингредиент {number}',
+                       measurement_unit=self.random.choice(UNITS))
+            for number in range(start, start + count)
+        ))
+
+    def users(self, count, prefix='user', start=0):
+        return self.bulk_create(CustomUser, (
+            CustomUser(
+                username=f'{prefix}{number}',
+                email=f'{prefix}{number}@example.com',
+                first_name=f'Имя {number}',
+                last_name=f'Фамилия {number}',
+                password=self.password
+            )
+            for number in range(start, start + count)
+        ))
+
+    def recipe_name(self):
+        dish, = self.random.choices(
+            DISHES, cum_weights=zipf_cum_weights(len(DISHES), self.power)
+        )
+        filling, = self.random.choices(
+            FILLINGS, cum_weights=zipf_cum_weights(len(FILLINGS), self.power)
+        )
+        return f'{dish.capitalize()} с {filling}'
+
+    def recipe_text(self, words=(20, 60)):
+        return ' '.join(self.random.choices(
+            TEXT_WORDS,
+            cum_weights=zipf_cum_weights(len(TEXT_WORDS), self.power),
+            k=self.random.randint(*words)
+        )).capitalize() + '.'
+
+    def recipes(self, author_ids, count, tag_ids, ingredient_ids,
+                tags_per_recipe=(1, 3), ingredients_per_recipe=(3, 12)):
+        """Create recipes of power-law distributed authors."""
+        recipe_ids = list()
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            authors = self.random.choices(
+                author_ids,
+                cum_weights=zipf_cum_weights(len(author_ids), self.power),
+                k=size
+            )
+            ids = self.bulk_create(Recipe, (
+                Recipe(
+                    author_id=author_id,
+                    name=self.recipe_name(),
+                    text=self.recipe_text(),
+                    cooking_time=self.random.randint(1, 180),
+                    image='recipes_images/placeholder.jpg'
+                )
+                for author_id in authors
+            ))
+            self.bulk_create(Recipe.tags.through, (
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in ids
+                for tag_id in self.popular(
+                    tag_ids, self.random.randint(*tags_per_recipe))
+            ))
+            self.bulk_create(IngredientAmount, (
+                IngredientAmount(recipe_id=recipe_id,
+                                 ingredient_id=ingredient_id,
+                                 amount=self.random.randint(1, 500))
+                for recipe_id in ids
+                for ingredient_id in self.popular(
+                    ingredient_ids,
+                    self.random.randint(*ingredients_per_recipe))
+            ))
+            recipe_ids.extend(ids)
+        return recipe_ids
+
+    def pairs(self, user_ids, target_ids, per_user):
+        for user_id in user_ids:
+            count = self.count(per_user, len(target_ids))
+            for target_id in self.popular(target_ids, count):
+                yield user_id, target_id
+
+    def favorites(self, user_ids, recipe_ids, per_user):
+        return self.bulk_create(Favorite, (
+            Favorite(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipe_id in self.pairs(
+                user_ids, recipe_ids, per_user)
+        ))
+
+    def carts(self, user_ids, recipe_ids, per_user):
+        """Fill carts; cart ingredient totals have to be rebuilt after."""
+        return self.bulk_create(Cart, (
+            Cart(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipe_id in self.pairs(
+                user_ids, recipe_ids, per_user)
+        ))
+
+    def follows(self, user_ids, author_ids, per_user):
+        return self.bulk_create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in self.pairs(
+                user_ids, author_ids, per_user)
+            if user_id != author_id
+        ))
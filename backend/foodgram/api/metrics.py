@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Timings of a single request; also a database execute wrapper."""
+
+    def __init__(self):
+        self.route = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.total_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.sql_count += 1
+
+    def activate(self):
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+    def server_timing(self):
+        return ', '.join((
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} SQL"',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+
+@contextmanager
+def measure_serializer():
+    """Add time spent in the block to serializer time of the request."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - started
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class MetricsBuffer:
+    """Ring buffer of the latest sampled request metrics."""
+
+    fields = ('total_time', 'sql_time', 'sql_count', 'serializer_time')
+
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._items = deque(maxlen=size)
+
+    def record(self, metrics):
+        with self._lock:
+            self._items.append((
+                metrics.route,
+                *(getattr(metrics, field) for field in self.fields)
+            ))
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def summary(self):
+        """Return p50/p95/p99 of every measured value per route."""
+        with self._lock:
+            items = list(self._items)
+        routes = defaultdict(list)
+        for route, *values in items:
+            routes[route].append(values)
+        summary = dict()
+        for route, rows in sorted(routes.items()):
+            summary[route] = {'count': len(rows)}
+            for field, values in zip(self.fields, zip(*rows)):
+                summary[route][field] = {
+                    name: round(percentile(values, share), 6)
+                    for name, share in (
+                        ('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+                }
+        return summary
+
+
+metrics_buffer = MetricsBuffer(settings.METRICS_BUFFER_SIZE)
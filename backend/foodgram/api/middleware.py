@@ -0,0 +1,39 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import RequestMetrics, metrics_buffer
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure SQL count, SQL time, serializer time and total time of a
+    sampled share of requests. Results are stored in the metrics buffer
+    and sent back in the Server-Timing header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.METRICS_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = metrics.activate()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        metrics.total_time = time.perf_counter() - started
+        match = request.resolver_match
+        metrics.route = (
+            f'{request.method} {match.view_name if match else request.path}'
+        )
+        metrics_buffer.record(metrics)
+        response['Server-Timing'] = metrics.server_timing()
+        return response
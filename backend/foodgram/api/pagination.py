@@ -1,5 +1,52 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+
+MAX_PAGE_SIZE = 100
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class LimitCursorPagination(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = ('-pub_date', '-id')
+
+
+class LimitPagination(BasePagination):
+    """
+    Page number pagination, or keyset pagination without a total count
+    when the request has a ``cursor`` parameter (empty for first page).
+    """
+
+    cursor_ordering = LimitCursorPagination.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if LimitCursorPagination.cursor_query_param in request.query_params:
+            self.paginator = LimitCursorPagination()
+            self.paginator.ordering = self.cursor_ordering
+        else:
+            self.paginator = LimitPageNumberPagination()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_page_state(self):
+        """Return what besides the items identifies the current page."""
+        if isinstance(self.paginator, CursorPagination):
+            return self.paginator.has_next, self.paginator.has_previous
+        page = self.paginator.page
+        return page.paginator.count, page.number
+
+
+class SubscriptionsPagination(LimitPagination):
+    cursor_ordering = ('username',)
+
+
+class FeedPagination(LimitPagination):
+    cursor_ordering = ('-pub_date', '-recipe')
@@ -0,0 +1,325 @@
+import re
+import threading
+import uuid
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from recipes.models import IngredientAmount, RecipeChange
+
+GENERATION_CACHE_KEY = 'recipe_index_generation'
+
+# Positions of set bits of every byte value.
+BYTE_BITS = tuple(
+    tuple(bit for bit in range(8) if value >> bit & 1)
+    for value in range(256)
+)
+NONZERO_BYTE = re.compile(rb'[^\x00]')
+
+
+def popcount(bitmap):
+    return bin(bitmap).count('1')
+
+
+popcount = getattr(int, 'bit_count', popcount)
+
+
+def to_bitmap(recipe_ids):
+    """Return an int with bits of the given sorted recipe ids set."""
+    if not recipe_ids:
+        return 0
+    data = bytearray(recipe_ids[-1] // 8 + 1)
+    for recipe_id in recipe_ids:
+        data[recipe_id >> 3] |= 1 << (recipe_id & 7)
+    return int.from_bytes(data, 'little')
+
+
+def from_bitmap(bitmap):
+    """Yield recipe ids of bits set in the int, in ascending order."""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for match in NONZERO_BYTE.finditer(data):
+        offset = match.start()
+        for bit in BYTE_BITS[data[offset]]:
+            yield offset * 8 + bit
+
+
+def size_slices(sizes):
+    """Return bitmaps of recipes whose size has the n-th bit set."""
+    length = max(sizes, default=0) // 8 + 1
+    slices = [
+        bytearray(length)
+        for _ in range(max(sizes.values(), default=0).bit_length())
+    ]
+    for recipe_id, size in sizes.items():
+        for position, data in enumerate(slices):
+            if size >> position & 1:
+                data[recipe_id >> 3] |= 1 << (recipe_id & 7)
+    return [int.from_bytes(data, 'little') for data in slices]
+
+
+def add_bitmap(counter, bitmap):
+    """
+    Add one to counts of recipes in the bitmap. The counter keeps
+    counts bit-sliced: its n-th bitmap holds the n-th bit of every count.
+    """
+    counter = list(counter)
+    for position, bits in enumerate(counter):
+        if not bitmap:
+            break
+        counter[position], bitmap = bits ^ bitmap, bits & bitmap
+    if bitmap:
+        counter.append(bitmap)
+    return counter
+
+
+def subtract(minuend, subtrahend):
+    """Subtract bit-sliced counts; no count may go below zero."""
+    result, borrow = list(), 0
+    for position in range(max(len(minuend), len(subtrahend))):
+        first = minuend[position] if position < len(minuend) else 0
+        second = subtrahend[position] if position < len(subtrahend) else 0
+        result.append(first ^ second ^ borrow)
+        borrow = (~first & second) | (~(first ^ second) & borrow)
+    return result
+
+
+def select(bitmap, slices, number):
+    """Keep recipes of the bitmap whose bit-sliced count is the number."""
+    if number.bit_length() > len(slices):
+        return 0
+    for position, bits in enumerate(slices):
+        bitmap &= bits if number >> position & 1 else ~bits
+    return bitmap
+
+
+def remove_recipes(posting, recipe_ids, bitmap):
+    """Return the posting without recipes given as a set and a bitmap."""
+    if isinstance(posting, int):
+        return posting & ~bitmap if posting & bitmap else posting
+    positions = [
+        position for position in (
+            bisect_left(posting, recipe_id) for recipe_id in recipe_ids
+        )
+        if position < len(posting) and posting[position] in recipe_ids
+    ]
+    if not positions:
+        return posting
+    posting = array('I', posting)
+    for position in sorted(positions, reverse=True):
+        del posting[position]
+    return posting
+
+
+def add_recipes(posting, recipe_ids):
+    """Return the posting with the given sorted recipe ids added."""
+    if isinstance(posting, int):
+        return posting | to_bitmap(recipe_ids)
+    posting = array('I', posting)
+    for recipe_id in recipe_ids:
+        insort(posting, recipe_id)
+    return posting
+
+
+class CookableRecipes:
+    """
+    Ranked (recipe_id, matched, missing) of recipes found by the index.
+
+    Recipes are kept as bitmaps of groups with the same numbers of
+    matched and missing ingredients, in rank order, and only groups a
+    requested slice falls into are turned into ids, newest first.
+    """
+
+    def __init__(self, groups):
+        self.groups = [
+            (matched, missing, bitmap, popcount(bitmap))
+            for matched, missing, bitmap in groups
+        ]
+        self.length = sum(group[3] for group in self.groups)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1 if index != -1 else None][0]
+        start, stop, step = index.indices(self.length)
+        found, offset = list(), 0
+        for matched, missing, bitmap, count in self.groups:
+            if offset >= stop:
+                break
+            if offset + count > start:
+                ids = list(from_bitmap(bitmap))[::-1]
+                found.extend(
+                    (recipe_id, matched, missing) for recipe_id in
+                    ids[max(start - offset, 0):stop - offset]
+                )
+            offset += count
+        return found[::step]
+
+
+class RecipeIngredientIndex:
+    """
+    In-memory inverted index from ingredient ids to recipes using them.
+
+    Recipes of an ingredient are kept as a sorted array of ids, or as a
+    bitmap when that takes less memory, which is the case for popular
+    ingredients. A query adds up bitmaps of the given ingredients into
+    bit-sliced counts and subtracts them from bit-sliced numbers of
+    ingredients of every recipe, so each step is a few operations on
+    whole bitmaps rather than on single recipes.
+
+    Recipes changed anywhere are appended to the ``RecipeChange`` log in
+    the database; every worker process patches its copy with the recipes
+    logged since its last read. Bumping the generation stamp in the
+    shared cache, or losing a part of the log, makes workers rebuild the
+    index from ``IngredientAmount``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._sequence = 0
+        self._index = ({}, {}, [])
+
+    def invalidate(self):
+        cache.set(GENERATION_CACHE_KEY, uuid.uuid4().hex, None)
+
+    def changed(self, recipe_id):
+        """Log that ingredients of the recipe were saved or deleted."""
+        RecipeChange.objects.log(recipe_id)
+
+    def _current_generation(self):
+        generation = cache.get(GENERATION_CACHE_KEY)
+        if generation is None:
+            cache.add(GENERATION_CACHE_KEY, uuid.uuid4().hex, None)
+            return cache.get(GENERATION_CACHE_KEY)
+        return generation
+
+    def _build(self):
+        arrays, sizes = defaultdict(lambda: array('I')), Counter()
+        rows = IngredientAmount.objects.order_by(
+            'ingredient_id', 'recipe_id'
+        ).values_list('ingredient_id', 'recipe_id')
+        for ingredient_id, recipe_id in rows.iterator(chunk_size=10000):
+            arrays[ingredient_id].append(recipe_id)
+            sizes[recipe_id] += 1
+        # A bitmap takes max id / 8 bytes, an array 4 bytes per recipe.
+        dense = max(sizes, default=0) // 32
+        postings = {
+            ingredient_id: to_bitmap(ids) if len(ids) > dense else ids
+            for ingredient_id, ids in arrays.items()
+        }
+        return postings, dict(sizes), size_slices(sizes)
+
+    def _patch(self, recipe_ids):
+        """Return a copy of the index with the recipes reloaded."""
+        postings, sizes, slices = self._index
+        changed = to_bitmap(sorted(recipe_ids))
+        postings = {
+            ingredient_id: remove_recipes(posting, recipe_ids, changed)
+            for ingredient_id, posting in postings.items()
+        }
+        sizes = {
+            recipe_id: size for recipe_id, size in sizes.items()
+            if recipe_id not in recipe_ids
+        }
+        added = defaultdict(list)
+        rows = IngredientAmount.objects.filter(
+            recipe__in=recipe_ids
+        ).order_by('recipe_id').values_list('ingredient_id', 'recipe_id')
+        for ingredient_id, recipe_id in rows:
+            added[ingredient_id].append(recipe_id)
+            sizes[recipe_id] = sizes.get(recipe_id, 0) + 1
+        for ingredient_id, ids in added.items():
+            postings[ingredient_id] = add_recipes(
+                postings.get(ingredient_id, array('I')), ids
+            )
+        slices = [bits & ~changed for bits in slices]
+        for recipe_id in recipe_ids:
+            size = sizes.get(recipe_id, 0)
+            slices.extend([0] * (size.bit_length() - len(slices)))
+            for position in range(size.bit_length()):
+                if size >> position & 1:
+                    slices[position] |= 1 << recipe_id
+        return postings, sizes, slices
+
+    def _load(self):
+        generation = self._current_generation()
+        if generation == self._generation:
+            sequence = self._sequence
+            _, last = RecipeChange.objects.since(sequence)
+            if last == sequence:
+                return self._index
+        with self._lock:
+            if generation != self._generation:
+                # Changes logged while building are patched in later.
+                last = RecipeChange.objects.last_number()
+                self._index = self._build()
+                self._generation, self._sequence = generation, last
+                return self._index
+            # Another thread may have caught up while this one waited.
+            recipe_ids, last = RecipeChange.objects.since(self._sequence)
+            if recipe_ids is None:
+                self._index = self._build()
+            elif recipe_ids:
+                self._index = self._patch(set(recipe_ids))
+            self._sequence = last
+            return self._index
+
+    def cookable(self, ingredient_ids, max_missing=0):
+        """
+        Return (recipe_id, matched, missing) of recipes using any of the
+        ingredients and lacking at most ``max_missing`` other ones,
+        recipes with fewer missing ingredients first.
+        """
+        postings, _, slices = self._load()
+        matched = list()
+        for ingredient_id in set(ingredient_ids):
+            posting = postings.get(ingredient_id, 0)
+            matched = add_bitmap(matched, (
+                posting if isinstance(posting, int) else to_bitmap(posting)
+            ))
+        candidates = 0
+        for bits in matched:
+            candidates |= bits
+        missing = subtract(slices, matched)
+        largest = 2 ** len(slices) - 1
+        by_size = [
+            (size, select(candidates, slices, size))
+            for size in range(largest, 0, -1)
+        ]
+        groups = list()
+        for number in range(min(max_missing, largest) + 1):
+            lacking = select(candidates, missing, number)
+            groups.extend(
+                (size - number, number, lacking & bitmap)
+                for size, bitmap in by_size
+                if size > number and lacking & bitmap
+            )
+        return CookableRecipes(groups)
+
+
+def cookable_in_db(ingredient_ids, max_missing=0):
+    """Same as RecipeIngredientIndex.cookable() with one SQL query."""
+    ingredient_ids = list(set(ingredient_ids))
+    if not ingredient_ids:
+        return IngredientAmount.objects.none()
+    used = Q(ingredient__in=ingredient_ids)
+    return IngredientAmount.objects.filter(
+        recipe__in=IngredientAmount.objects.filter(used).values('recipe')
+    ).values('recipe').annotate(
+        matched=Count('pk', filter=used),
+        total=Count('pk')
+    ).annotate(
+        missing=F('total') - F('matched')
+    ).filter(missing__lte=max_missing).order_by(
+        'missing', '-matched', '-recipe_id'
+    ).values_list('recipe', 'matched', 'missing')
+
+
+recipe_index = RecipeIngredientIndex()
@@ -0,0 +1,80 @@
+import hashlib
+import threading
+import uuid
+from collections import Counter
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class ResponseCache:
+    """
+    Shared cache of rendered responses for anonymous users.
+
+    Keys contain a generation stamp kept in the cache, so bumping the
+    generation drops every stored response at once in all workers.
+    Hit and miss counters are kept per worker process, so a hit never
+    writes to the shared cache.
+    """
+
+    def __init__(self, prefix, timeout):
+        self.prefix = prefix
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    @property
+    def generation_key(self):
+        return f'{self.prefix}:generation'
+
+    def generation(self):
+        generation = cache.get(self.generation_key)
+        if generation is None:
+            cache.add(self.generation_key, uuid.uuid4().hex, None)
+            return cache.get(self.generation_key)
+        return generation
+
+    def bump(self):
+        cache.set(self.generation_key, uuid.uuid4().hex, None)
+
+    def key(self, request):
+        # Empty parameters are kept: ``?cursor=`` switches the
+        # paginator and must not share a key with the plain URL.
+        params = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+        )
+        raw = f'{request.path}?{urlencode(params, doseq=True)}'
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        return f'{self.prefix}:{self.generation()}:{digest}'
+
+    def count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, request):
+        """
+        Return the cache key for the request and the stored value.
+
+        The key has to be reused to store a freshly built value, so a
+        response built before a generation bump never lands under the
+        new generation.
+        """
+        key = self.key(request)
+        value = cache.get(key)
+        self.count('hits' if value is not None else 'misses')
+        return key, value
+
+    def set(self, key, value):
+        cache.set(key, value, self.timeout)
+
+    def stats(self):
+        """Return hit and miss counters of this worker process."""
+        with self._lock:
+            return {
+                name: self._counters[name] for name in ('hits', 'misses')
+            }
+
+
+recipe_cache = ResponseCache('recipes', settings.RECIPE_CACHE_TIMEOUT)
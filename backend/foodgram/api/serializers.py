@@ -1,12 +1,17 @@
 from django.db import transaction
+from django.db.models import F
 from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer
-from drf_extra_fields.fields import Base64ImageField
-from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
-                            Recipe, Tag)
+from recipes.models import (Cart, CartIngredientTotal, Favorite, Ingredient,
+                            IngredientAmount, Recipe, Tag, TimelineEntry)
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
 from users.models import CustomUser, Follow
 
+from .fields import StreamingBase64ImageField, validate_image_limits
+from .images import get_image_urls, schedule_image_processing
+
+RECIPES_LIMIT = 3
+
 
 class UserCreateSerializer(BaseUserCreateSerializer):
     """Serializer for Djoser users' authentication."""
@@ -44,6 +49,10 @@ class UserSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        if hasattr(obj, 'viewer_follows'):
+            return bool(obj.viewer_follows)
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -113,7 +122,16 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'measurement_unit', 'amount']
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeImagesMixin(serializers.Serializer):
+    """Mixin adding URLs of recipe image variants."""
+
+    images = serializers.SerializerMethodField()
+
+    def get_images(self, obj):
+        return get_image_urls(obj, self.context.get('request'))
+
+
+class RecipeReadSerializer(RecipeImagesMixin, serializers.ModelSerializer):
     """Serializer to GET data from Recipe model."""
 
     author = UserSerializer(read_only=True)
@@ -127,17 +145,19 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'tags', 'author', 'ingredients',
             'is_favorited', 'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time'
+            'name', 'image', 'images', 'text', 'cooking_time'
         ]
         read_only_fields = [
             'ingredients', 'is_favorited', 'is_in_shopping_cart'
         ]
 
     def get_ingredients(self, obj):
-        ingredients = IngredientAmount.objects.filter(recipe=obj)
+        ingredients = obj.recipe_amount.all()
         return IngredientAmountSerializer(ingredients, many=True).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -145,6 +165,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         return Favorite.objects.filter(recipe=obj, user=user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -152,12 +174,22 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         return Cart.objects.filter(recipe=obj, user=user).exists()
 
 
+class CookableRecipeSerializer(RecipeReadSerializer):
+    """Serializer for recipes found by available ingredients."""
+
+    matched_ingredients = serializers.IntegerField(read_only=True)
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeReadSerializer.Meta.fields + [
+            'matched_ingredients', 'missing_ingredients'
+        ]
+
+
 class IngredientAmountCreateSerializer(serializers.ModelSerializer):
     """Serializer to POST/PATCH/DELETE data for IngredientAmount model."""
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.values_list('id', flat=True)
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -165,16 +197,27 @@ class IngredientAmountCreateSerializer(serializers.ModelSerializer):
         fields = ['id', 'amount']
 
 
-class RecipeCreateSerializer(serializers.ModelSerializer):
+class ImageUploadMixin:
+    """
+    Mixin closing the uploaded image after save, so the temporary file
+    moved into the storage is not cleaned up again on garbage collection.
+    """
+
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
+
+class RecipeCreateSerializer(ImageUploadMixin, serializers.ModelSerializer):
     """Serializer to POST/PATCH/DELETE data for Recipe model."""
 
     author = UserSerializer(read_only=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
-        allow_null=False
-    )
-    image = Base64ImageField(
+    tags = serializers.ListField(child=serializers.IntegerField())
+    image = StreamingBase64ImageField(
         max_length=None,
         required=True,
         use_url=True)
@@ -188,6 +231,26 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             'name', 'text', 'cooking_time'
         ]
 
+    def validate_tags(self, value):
+        tags = Tag.objects.in_bulk(value)
+        missing = sorted(set(value) - tags.keys())
+        if missing:
+            raise serializers.ValidationError(
+                f'Тегов с id {", ".join(map(str, missing))} не существует!')
+        return [tags[pk] for pk in value]
+
+    def validate_ingredients(self, value):
+        ids = {ingredient['id'] for ingredient in value}
+        existing = set(
+            Ingredient.objects.filter(id__in=ids).values_list('id', flat=True)
+        )
+        missing = sorted(ids - existing)
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиентов с id {", ".join(map(str, missing))} '
+                f'не существует!')
+        return value
+
     def validate(self, data):
         tags = data['tags']
         if not tags:
@@ -218,7 +281,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             [IngredientAmount(
                 recipe=recipe,
                 amount=ingredient['amount'],
-                ingredient=Ingredient.objects.get(id=ingredient['id'])
+                ingredient_id=ingredient['id']
             ) for ingredient in ingredients]
         )
 
@@ -228,31 +291,104 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
         recipe = Recipe.objects.create(author=author, **validated_data)
+        CustomUser.objects.filter(pk=author.pk).update(
+            recipes_count=F('recipes_count') + 1
+        )
+        TimelineEntry.objects.fan_out(recipe)
         recipe.tags.set(tags_data)
         self.create_ingredients(ingredients, recipe)
+        schedule_image_processing(recipe.pk)
         return recipe
 
+    def update_ingredients(self, ingredients, recipe):
+        """
+        Bring ingredient amounts of the recipe in line with the given ones,
+        touching only changed rows. Return {ingredient_id: delta}.
+        """
+        current = {
+            amount.ingredient_id: amount
+            for amount in IngredientAmount.objects.filter(recipe=recipe)
+        }
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        deltas = {
+            pk: -amount.amount
+            for pk, amount in current.items() if pk not in amounts
+        }
+        created = list()
+        changed = list()
+        for pk, amount in amounts.items():
+            if pk not in current:
+                created.append(IngredientAmount(
+                    recipe=recipe, ingredient_id=pk, amount=amount))
+                deltas[pk] = amount
+            elif current[pk].amount != amount:
+                deltas[pk] = amount - current[pk].amount
+                current[pk].amount = amount
+                changed.append(current[pk])
+        removed = [pk for pk in current if pk not in amounts]
+        if removed:
+            IngredientAmount.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        IngredientAmount.objects.bulk_update(changed, ['amount'])
+        IngredientAmount.objects.bulk_create(created)
+        return deltas
+
     @transaction.atomic
     def update(self, instance, validated_data):
-        tags_data = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.tags.set(tags_data)
-        IngredientAmount.objects.filter(recipe=instance).all().delete()
-        self.create_ingredients(validated_data.pop('ingredients'), instance)
+        # Save the locked row: the instance loaded by the view may hold
+        # counters changed since then by favorites and carts.
+        instance = Recipe.objects.select_for_update().get(pk=instance.pk)
+        instance.tags.set(validated_data.pop('tags'))
+        deltas = self.update_ingredients(
+            validated_data.pop('ingredients'), instance
+        )
+        CartIngredientTotal.objects.apply_deltas(
+            list(instance.cart.values_list('user_id', flat=True)), deltas
+        )
+        if 'image' in validated_data:
+            validated_data['image_hash'] = ''
+            schedule_image_processing(instance.pk)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        instance = Recipe.objects.with_user_flags(request.user).get(
+            pk=instance.pk
+        )
         return RecipeReadSerializer(instance, context=context).data
 
 
-class ShortenedRecipeSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(ImageUploadMixin, serializers.ModelSerializer):
+    """Serializer to upload Recipe image as multipart/form-data."""
+
+    image = serializers.ImageField(validators=[validate_image_limits])
+
+    class Meta:
+        model = Recipe
+        fields = ['image']
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        validated_data['image_hash'] = ''
+        schedule_image_processing(instance.pk)
+        return super().update(instance, validated_data)
+
+    def to_representation(self, instance):
+        return ShortenedRecipeSerializer(instance, context=self.context).data
+
+
+class ShortenedRecipeSerializer(RecipeImagesMixin,
+                                serializers.ModelSerializer):
     """Serializer for representation of shortened Recipe Model."""
 
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'images', 'cooking_time']
 
 
 class FavoritesSerializer(serializers.ModelSerializer):
@@ -270,6 +406,14 @@ class FavoritesSerializer(serializers.ModelSerializer):
                 'Рецепт уже добавлен в избранное!')
         return data
 
+    @transaction.atomic
+    def create(self, validated_data):
+        favorite = super().create(validated_data)
+        Recipe.objects.filter(pk=favorite.recipe_id).touch(
+            favorites_count=F('favorites_count') + 1
+        )
+        return favorite
+
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
@@ -284,6 +428,15 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ['user', 'recipe']
 
+    @transaction.atomic
+    def create(self, validated_data):
+        cart = super().create(validated_data)
+        CartIngredientTotal.objects.add_recipe([cart.user_id], cart.recipe)
+        Recipe.objects.filter(pk=cart.recipe_id).touch(
+            carts_count=F('carts_count') + 1
+        )
+        return cart
+
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
@@ -295,7 +448,6 @@ class FollowReadSerializer(UserSerializer):
     """Serializer for users' subscription."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
@@ -305,13 +457,14 @@ class FollowReadSerializer(UserSerializer):
         ]
 
     def get_recipes(self, obj):
-        recipes = Recipe.objects.filter(author=obj).all()[:3]
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
+        else:
+            limit = self.context.get('recipes_limit', RECIPES_LIMIT)
+            recipes = Recipe.objects.filter(author=obj)[:limit]
         serializer = ShortenedRecipeSerializer(
             recipes,
             many=True,
             context={'request': self.context.get('request')}
         )
         return serializer.data
-
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
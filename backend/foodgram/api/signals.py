@@ -0,0 +1,75 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import CustomUser
+
+from .filters import invalidate_tag_map
+from .ingredient_index import ingredient_index
+from .recipe_index import recipe_index
+from .response_cache import recipe_cache
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+# Ingredient amounts are only written together with their recipe, and
+# the index reloads all amounts of a logged recipe, so one change per
+# saved or deleted recipe is enough.
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def update_recipe_index(sender, instance, **kwargs):
+    transaction.on_commit(partial(recipe_index.changed, instance.pk))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    transaction.on_commit(invalidate_tag_map)
+
+
+# Author, tag and ingredient details are a part of recipe responses, so
+# recipes showing them are touched to change their ETag and Last-Modified.
+AUTHOR_FIELDS = frozenset(('email', 'username', 'first_name', 'last_name'))
+
+
+@receiver(post_save, sender=CustomUser)
+def touch_author_recipes(sender, instance, created, update_fields,
+                         **kwargs):
+    if created or (
+            update_fields is not None
+            and AUTHOR_FIELDS.isdisjoint(update_fields)):
+        return
+    Recipe.objects.filter(author=instance).touch()
+    transaction.on_commit(recipe_cache.bump)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tag_recipes(sender, instance, created=False, **kwargs):
+    if not created:
+        Recipe.objects.filter(tags=instance).touch()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, created=False, **kwargs):
+    if not created:
+        Recipe.objects.filter(recipe_amount__ingredient=instance).touch()
+
+
+# Tags and ingredient amounts of a recipe are only written together with
+# the recipe itself, so its receivers cover them with one bump.
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_recipe_cache(sender, **kwargs):
+    transaction.on_commit(recipe_cache.bump)
@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientsViewSet, RecipeViewSet, TagsViewSet, UserViewSet
+from .views import (IngredientsViewSet, MetricsView, RecipeViewSet,
+                    TagsViewSet, UserViewSet)
 
 api_router = DefaultRouter()
 
@@ -11,6 +12,7 @@ api_router.register('ingredients', IngredientsViewSet),
 api_router.register('recipes', RecipeViewSet),
 
 urlpatterns = [
+    path('_metrics/', MetricsView.as_view()),
     path('', include(api_router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
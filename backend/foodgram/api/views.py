@@ -1,51 +1,88 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 from django_filters import rest_framework as filters
 from djoser.views import UserViewSet as DjoserUserViewSet
-from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
-                            Recipe, Tag)
+from recipes.models import (Cart, CartIngredientTotal, Favorite, Ingredient,
+                            Recipe, Tag, TimelineEntry)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 from users.models import CustomUser, Follow
 
+from .exporters import SHOPPING_CART_EXPORTERS
 from .filters import IngredientsFilter, RecipesFilter
-from .pagination import LimitPageNumberPagination
+from .metrics import measure_serializer, metrics_buffer
+from .pagination import (FeedPagination, LimitPageNumberPagination,
+                         LimitPagination, SubscriptionsPagination)
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly, IsOwner
-from .serializers import (FavoritesSerializer, FollowReadSerializer,
+from .recipe_index import cookable_in_db, recipe_index
+from .response_cache import recipe_cache
+from .serializers import (RECIPES_LIMIT, CookableRecipeSerializer,
+                          FavoritesSerializer, FollowReadSerializer,
                           FollowSerializer, IngredientsSerializer,
-                          RecipeCreateSerializer, RecipeReadSerializer,
-                          ShoppingCartSerializer, TagSerializer)
+                          RecipeCreateSerializer, RecipeImageSerializer,
+                          RecipeReadSerializer, ShoppingCartSerializer,
+                          TagSerializer)
 
 
 class UserViewSet(DjoserUserViewSet):
     """ViewSet for users/ """
 
+    def get_recipes_limit(self):
+        try:
+            limit = int(self.request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            return RECIPES_LIMIT
+        return max(limit, 0)
+
     @action(
         methods=['get'], detail=False,
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        pagination_class=SubscriptionsPagination
     )
     def subscriptions(self, request):
         user = request.user
-        self.pagination_class = LimitPageNumberPagination
-        users = CustomUser.objects.filter(following__user=user)
-        paginated_data = self.paginate_queryset(users)
+        recipes_limit = self.get_recipes_limit()
+        users = CustomUser.objects.filter(following__user=user).annotate(
+            is_subscribed=Value(True)
+        ).order_by('username')
+        authors = self.paginate_queryset(users)
+        latest_recipes = {author.id: [] for author in authors}
+        for recipe in Recipe.objects.latest_by_author(
+                authors, recipes_limit,
+                ['name', 'image', 'image_hash', 'cooking_time']):
+            latest_recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = latest_recipes[author.id]
         serializer = FollowReadSerializer(
-            data=paginated_data, many=True, context={'request': request}
+            authors, many=True,
+            context={'request': request, 'recipes_limit': recipes_limit}
         )
-        serializer.is_valid()
-        return self.get_paginated_response(serializer.data)
+        with measure_serializer():
+            data = serializer.data
+        return self.get_paginated_response(data)
 
     @action(
         methods=['post', 'delete'], detail=True,
         permission_classes=[IsAuthenticated]
     )
+    @transaction.atomic
     def subscribe(self, request, **kwargs):
         user = request.user
-        id = self.kwargs.get('pk')
+        id = self.kwargs.get(self.lookup_field)
         author = get_object_or_404(CustomUser, id=id)
         serializer = FollowSerializer(data={
                                       'user': user.follower,
@@ -56,10 +93,25 @@ class UserViewSet(DjoserUserViewSet):
         if request.method == 'POST':
             serializer.is_valid(raise_exception=True)
             serializer.save(user=user)
-            serializer = FollowReadSerializer(author)
+            CustomUser.objects.filter(pk=author.pk).update(
+                followers_count=F('followers_count') + 1
+            )
+            TimelineEntry.objects.follow(user.id, author.id)
+            serializer = FollowReadSerializer(
+                author,
+                context={
+                    'request': request,
+                    'recipes_limit': self.get_recipes_limit()
+                }
+            )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        subscription = get_object_or_404(Follow, user=user, author=author)
-        subscription.delete()
+        deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+        if not deleted:
+            raise Http404
+        CustomUser.objects.filter(pk=author.pk).update(
+            followers_count=F('followers_count') - 1
+        )
+        TimelineEntry.objects.unfollow(user.id, author.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -78,23 +130,244 @@ class IngredientsViewSet(ReadOnlyModelViewSet):
     serializer_class = IngredientsSerializer
     permission_classes = (AllowAny,)
     filter_backends = (IngredientsFilter,)
-    search_fields = ('^name',)
+    pagination_class = None
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """ViewSet for recipes/ """
 
     queryset = Recipe.objects.all()
-    pagination_class = LimitPageNumberPagination
+    pagination_class = LimitPagination
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (filters.DjangoFilterBackend,)
     filter_class = RecipesFilter
 
+    def get_queryset(self):
+        if self.action in (
+                'list', 'retrieve', 'popular', 'feed', 'cookable'):
+            return Recipe.objects.with_user_flags(self.request.user)
+        return super().get_queryset()
+
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action == 'cookable':
+            return CookableRecipeSerializer
+        if self.action in ('list', 'retrieve', 'popular', 'feed'):
             return RecipeReadSerializer
         return RecipeCreateSerializer
 
+    def get_validators(self, recipes, *extra):
+        """
+        Return strong ETag and Last-Modified timestamp for recipes
+        as seen by the current user.
+
+        Only a single recipe gets a timestamp: removing a recipe from
+        a page keeps the newest timestamp of the rest, so collections
+        are validated by the ETag alone.
+        """
+        digest = hashlib.sha1(
+            repr((self.request.user.pk, extra)).encode()
+        )
+        last_modified = None
+        for recipe in recipes:
+            digest.update(repr((
+                recipe.pk, recipe.updated_at.isoformat(),
+                recipe.is_favorited, recipe.is_in_shopping_cart,
+                bool(getattr(recipe.author, 'viewer_follows', None))
+            )).encode())
+            if last_modified is None or recipe.updated_at > last_modified:
+                last_modified = recipe.updated_at
+        return (
+            quote_etag(digest.hexdigest()),
+            timegm(last_modified.utctimetuple())
+            if last_modified and self.detail else None
+        )
+
+    def conditional_response(self, request, load, serialize):
+        """
+        Build a response for recipes returned by ``load`` honoring
+        If-None-Match / If-Modified-Since. Responses for anonymous users
+        are kept in the shared recipe cache.
+        """
+        cache_key, cached = (
+            recipe_cache.get(request)
+            if request.user.is_anonymous else (None, None)
+        )
+        if cached is None:
+            recipes, extra = load()
+            etag, last_modified = self.get_validators(recipes, *extra)
+        else:
+            etag, last_modified, data = cached
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            if cached is None:
+                with measure_serializer():
+                    data = serialize(recipes)
+                if cache_key is not None:
+                    recipe_cache.set(cache_key, (etag, last_modified, data))
+            response = Response(data)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        if cache_key is not None:
+            response['X-Cache'] = 'MISS' if cached is None else 'HIT'
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        def load():
+            page = self.paginate_queryset(
+                self.filter_queryset(self.get_queryset())
+            )
+            return page, self.paginator.get_page_state()
+
+        def serialize(page):
+            return self.get_paginated_response(
+                self.get_serializer(page, many=True).data
+            ).data
+
+        return self.conditional_response(request, load, serialize)
+
+    @action(
+        methods=['get'], detail=False,
+        pagination_class=LimitPageNumberPagination
+    )
+    def popular(self, request):
+        def load():
+            page = self.paginate_queryset(
+                self.filter_queryset(self.get_queryset()).annotate(
+                    popularity=F('score__score')
+                ).filter(popularity__isnull=False).order_by(
+                    '-popularity', '-id'
+                )
+            )
+            return page, (
+                self.paginator.page.paginator.count,
+                self.paginator.page.number,
+                [recipe.popularity for recipe in page]
+            )
+
+        def serialize(page):
+            return self.get_paginated_response(
+                self.get_serializer(page, many=True).data
+            ).data
+
+        return self.conditional_response(request, load, serialize)
+
+    @action(
+        methods=['get'], detail=False,
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedPagination
+    )
+    def feed(self, request):
+        def load():
+            TimelineEntry.objects.pull(request.user.id)
+            entries = self.paginate_queryset(
+                TimelineEntry.objects.filter(user=request.user)
+            )
+            recipes = self.get_queryset().in_bulk(
+                [entry.recipe_id for entry in entries]
+            )
+            return [
+                recipes[entry.recipe_id] for entry in entries
+                if entry.recipe_id in recipes
+            ], self.paginator.get_page_state()
+
+        def serialize(page):
+            return self.get_paginated_response(
+                self.get_serializer(page, many=True).data
+            ).data
+
+        return self.conditional_response(request, load, serialize)
+
+    def get_cookable_params(self):
+        try:
+            ingredient_ids = [
+                int(pk) for pk in self.request.query_params.getlist(
+                    'ingredients'
+                )
+            ]
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'Ингредиенты задаются их id.'}
+            )
+        try:
+            max_missing = int(self.request.query_params['max_missing'])
+        except (KeyError, ValueError):
+            return ingredient_ids, 0
+        return ingredient_ids, max(max_missing, 0)
+
+    @action(
+        methods=['get'], detail=False,
+        pagination_class=LimitPageNumberPagination
+    )
+    def cookable(self, request):
+        ingredient_ids, max_missing = self.get_cookable_params()
+
+        def load():
+            page = self.paginate_queryset(
+                recipe_index.cookable(ingredient_ids, max_missing)
+                if settings.RECIPE_INDEX
+                else cookable_in_db(ingredient_ids, max_missing)
+            )
+            recipes = self.get_queryset().in_bulk(
+                [recipe_id for recipe_id, _, _ in page]
+            )
+            found = list()
+            for recipe_id, matched, missing in page:
+                recipe = recipes.get(recipe_id)
+                if recipe is not None:
+                    recipe.matched_ingredients = matched
+                    recipe.missing_ingredients = missing
+                    found.append(recipe)
+            return found, (
+                self.paginator.page.paginator.count,
+                self.paginator.page.number,
+                [tuple(item) for item in page]
+            )
+
+        def serialize(page):
+            return self.get_paginated_response(
+                self.get_serializer(page, many=True).data
+            ).data
+
+        return self.conditional_response(request, load, serialize)
+
+    def retrieve(self, request, *args, **kwargs):
+        def load():
+            return [self.get_object()], ()
+
+        def serialize(recipes):
+            return self.get_serializer(recipes[0]).data
+
+        return self.conditional_response(request, load, serialize)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        Recipe.objects.filter(pk=instance.pk).lock()
+        CartIngredientTotal.objects.remove_recipe(
+            list(instance.cart.values_list('user_id', flat=True)), instance
+        )
+        super().perform_destroy(instance)
+        CustomUser.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') - 1
+        )
+
+    @action(
+        methods=['put'], detail=True,
+        parser_classes=[MultiPartParser]
+    )
+    def image(self, request, pk):
+        serializer = RecipeImageSerializer(
+            self.get_object(),
+            data=request.data,
+            context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
     @action(
         methods=['post'], detail=True,
         permission_classes=[IsAuthenticated]
@@ -110,11 +383,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @favorite.mapping.delete
+    @transaction.atomic
     def delete_favorite(self, request, pk):
         user = request.user
         recipe = get_object_or_404(Recipe, id=pk)
-        model_item = get_object_or_404(Favorite, user=user, recipe=recipe)
-        model_item.delete()
+        deleted, _ = Favorite.objects.filter(user=user, recipe=recipe).delete()
+        if not deleted:
+            raise Http404
+        Recipe.objects.filter(pk=recipe.pk).touch(
+            favorites_count=F('favorites_count') - 1
+        )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -132,33 +410,44 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @shopping_cart.mapping.delete
+    @transaction.atomic
     def delete_shopping_cart(self, request, pk):
         user = request.user
         recipe = get_object_or_404(Recipe, id=pk)
-        model_item = get_object_or_404(Cart, user=user, recipe=recipe)
-        model_item.delete()
+        deleted, _ = Cart.objects.filter(user=user, recipe=recipe).delete()
+        if not deleted:
+            raise Http404
+        CartIngredientTotal.objects.remove_recipe([user.id], recipe)
+        Recipe.objects.filter(pk=recipe.pk).touch(
+            carts_count=F('carts_count') - 1
+        )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         methods=['get'], detail=False,
-        permission_classes=[IsOwner]
+        permission_classes=[IsOwner],
+        renderer_classes=SHOPPING_CART_EXPORTERS
     )
     def download_shopping_cart(self, request):
-        ingredients = IngredientAmount.objects.filter(
-            recipe__cart__user=request.user
-        ).values(
-            'ingredient_id__name',
-            'ingredient_id__measurement_unit'
-        ).order_by('ingredient_id__name').annotate(total=Sum('amount'))
-        shopping_cart = list()
-        shopping_cart.append('Список покупок: \n')
-        for ingredient in ingredients:
-            shopping_cart.append(
-                f'{ingredient["ingredient_id__name"]} - '
-                f'{ingredient["total"]} '
-                f'{ingredient["ingredient_id__measurement_unit"]} \n'
-            )
-        filename = 'shopping_cart.txt'
-        response = HttpResponse(shopping_cart, 'Content-Type: text/plain')
-        response['Content-Disposition'] = f'attachment; filename={filename}'
+        ingredients = CartIngredientTotal.objects.shopping_list(request.user)
+        exporter = request.accepted_renderer
+        response = StreamingHttpResponse(
+            exporter.stream(ingredients.iterator()),
+            content_type=f'{exporter.media_type}; charset={exporter.charset}'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename={exporter.get_filename()}'
+        )
         return response
+
+
+class MetricsView(APIView):
+    """View for _metrics/ with timings of sampled requests."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'routes': metrics_buffer.summary(),
+            'recipe_cache': recipe_cache.stats(),
+        })
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,6 +80,38 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram_cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', default=10000)),
+        },
+    }
+}
+
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', default=60 * 60))
+
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv('RECIPE_IMAGE_MAX_SIZE', default=10 * 1024 * 1024))
+
+RECIPE_IMAGE_MAX_PIXELS = int(os.getenv('RECIPE_IMAGE_MAX_PIXELS', default=40_000_000))
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+
+INGREDIENT_INDEX = os.getenv('INGREDIENT_INDEX', default='True') == 'True'
+
+RECIPE_INDEX = os.getenv('RECIPE_INDEX', default='True') == 'True'
+
+POPULAR_HALF_LIFE_DAYS = float(os.getenv('POPULAR_HALF_LIFE_DAYS', default=7))
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', default=1000))
+
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', default=100))
+
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', default=0))
+
+METRICS_BUFFER_SIZE = int(os.getenv('METRICS_BUFFER_SIZE', default=10000))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -12,13 +12,10 @@ class IngredientInlineAdmin(admin.TabularInline):
 class RecipeAdmit(admin.ModelAdmin):
     """Admin model for Recipe."""
 
-    list_display = ('name', 'author', 'is_in_favorites',)
+    list_display = ('name', 'author', 'favorites_count', 'carts_count',)
     list_filter = ('author', 'name', 'tags',)
     inlines = (IngredientInlineAdmin,)
 
-    def is_in_favorites(self, obj):
-        return Recipe.objects.filter(favorite__recipe_id=obj).count()
-
 
 @admin.register(Ingredient)
 class IngridientAdmit(admin.ModelAdmin):
@@ -33,6 +30,26 @@ class IngridientAmountAdmit(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', )
     list_filter = ('recipe',)
 
+    # Signals of the recipe refresh cached responses and the recipe index.
+    def touch(self, recipes):
+        for recipe in recipes:
+            recipe.save(update_fields=['updated_at'])
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self.touch([obj.recipe])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.touch([obj.recipe])
+
+    def delete_queryset(self, request, queryset):
+        recipes = list(
+            Recipe.objects.filter(recipe_amount__in=queryset).distinct()
+        )
+        super().delete_queryset(request, queryset)
+        self.touch(recipes)
+
 
 @admin.register(Tag)
 class TagAdmit(admin.ModelAdmin):
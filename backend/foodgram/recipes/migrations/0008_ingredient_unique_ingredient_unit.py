@@ -0,0 +1,56 @@
+# Generated by Django 4.1.7 on 2026-10-18 02:20
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """
+    Keep the first of ingredients with the same name and unit and move
+    recipe amounts of the others to it. Cart totals of merged
+    ingredients are dropped; 0018_fill_cart_totals recomputes them.
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientAmount = apps.get_model('recipes', 'IngredientAmount')
+    CartIngredientTotal = apps.get_model('recipes', 'CartIngredientTotal')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).order_by().annotate(
+        keep=Min('id'), copies=Count('id')
+    ).filter(copies__gt=1)
+    for row in list(duplicates):
+        copies = Ingredient.objects.filter(
+            name=row['name'], measurement_unit=row['measurement_unit']
+        ).exclude(pk=row['keep'])
+        for copy_id in copies.values_list('id', flat=True):
+            amounts = IngredientAmount.objects.filter(ingredient=copy_id)
+            amounts.filter(recipe__in=IngredientAmount.objects.filter(
+                ingredient=row['keep']
+            ).values('recipe')).delete()
+            amounts.update(ingredient=row['keep'])
+        CartIngredientTotal.objects.filter(
+            ingredient__name=row['name'],
+            ingredient__measurement_unit=row['measurement_unit']
+        ).delete()
+        copies.delete()
+
+
+class Migration(migrations.Migration):
+    # Data changes and the constraint run in separate transactions:
+    # PostgreSQL cannot alter a table with pending deferred FK checks.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0007_cartingredienttotal'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop,
+            atomic=True
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_unit'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+POSTGRESQL_INDEXES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS ingredient_name_prefix_idx '
+    'ON recipes_ingredient (LOWER(name) text_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS ingredient_name_trgm_idx '
+    'ON recipes_ingredient USING gin (LOWER(name) gin_trgm_ops)',
+]
+
+FALLBACK_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS ingredient_name_prefix_idx '
+    'ON recipes_ingredient (LOWER(name))',
+]
+
+DROP_INDEXES = [
+    'DROP INDEX IF EXISTS ingredient_name_prefix_idx',
+    'DROP INDEX IF EXISTS ingredient_name_trgm_idx',
+]
+
+
+def create_indexes(apps, schema_editor):
+    statements = (
+        POSTGRESQL_INDEXES
+        if schema_editor.connection.vendor == 'postgresql'
+        else FALLBACK_INDEXES
+    )
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_indexes(apps, schema_editor):
+    for statement in DROP_INDEXES:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_ingredient_unique_ingredient_unit'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import Sum
+
+
+def fill_cart_totals(apps, schema_editor):
+    IngredientAmount = apps.get_model('recipes', 'IngredientAmount')
+    CartIngredientTotal = apps.get_model('recipes', 'CartIngredientTotal')
+    totals = IngredientAmount.objects.filter(
+        recipe__cart__isnull=False
+    ).values(
+        'recipe__cart__user', 'ingredient'
+    ).order_by().annotate(total=Sum('amount'))
+    CartIngredientTotal.objects.all().delete()
+    CartIngredientTotal.objects.bulk_create(
+        (CartIngredientTotal(user_id=row['recipe__cart__user'],
+                             ingredient_id=row['ingredient'],
+                             total=row['total'])
+         for row in totals.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_cart_totals, migrations.RunPython.noop),
+    ]
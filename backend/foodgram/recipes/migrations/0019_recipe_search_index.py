@@ -0,0 +1,28 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import recipes.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_fill_cart_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchIndex',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('document', recipes.models.FullTextDocumentField(db_column='recipes_recipe_fts', verbose_name='Документ')),
+            ],
+            options={
+                'verbose_name': 'Поисковый индекс рецепта',
+                'verbose_name_plural': 'Поисковый индекс рецептов',
+                'db_table': 'recipes_recipe_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_recipe_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.BigIntegerField(unique=True, verbose_name='Номер изменения')),
+                ('recipe_id', models.IntegerField(verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Изменение рецепта',
+                'verbose_name_plural': 'Изменения рецептов',
+                'ordering': ('number',),
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeChangeCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.BigIntegerField(default=0, verbose_name='Номер последнего изменения')),
+            ],
+            options={
+                'verbose_name': 'Счётчик изменений рецептов',
+                'verbose_name_plural': 'Счётчик изменений рецептов',
+            },
+        ),
+    ]
@@ -1,10 +1,31 @@
+import math
+import re
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
 from colorfield.fields import ColorField
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import (Case, Exists, F, FloatField, Func, OuterRef,
+                              Prefetch, Q, Subquery, Sum, Value, When, Window)
+from django.db.models.functions import RowNumber, TruncHour
+from django.utils import timezone
+from users.models import Follow
 
 User = get_user_model()
 
+SCORE_EPOCH = datetime(2023, 1, 1, tzinfo=dt_timezone.utc)
+
+SEARCH_CONFIG = 'russian'
+
+# Recipe changes kept for in-memory indexes catching up; indexes that
+# fall further behind are rebuilt.
+RECIPE_CHANGE_LOG_SIZE = 10000
+
 
 class Ingredient(models.Model):
     """Model for igredients."""
@@ -22,6 +43,12 @@ class Ingredient(models.Model):
         ordering = ('id',)
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_unit'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -54,6 +81,131 @@ class Tag(models.Model):
         return self.slug
 
 
+class FullTextMatch(models.Lookup):
+    """``MATCH`` against the hidden column of an SQLite FTS5 table."""
+
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+class FullTextDocumentField(models.TextField):
+    """Hidden column of an FTS5 table named after the table itself."""
+
+
+FullTextDocumentField.register_lookup(FullTextMatch)
+
+
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet for recipes."""
+
+    def with_user_flags(self, user):
+        """
+        Preload everything a page of recipes needs to be serialized
+        for the given user in a fixed number of queries.
+        """
+        queryset = self.select_related('author').prefetch_related(
+            'tags', 'recipe_amount__ingredient'
+        ).defer('search_vector')
+        if user is None or user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                Cart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+        ).prefetch_related(
+            Prefetch(
+                'author__following',
+                queryset=Follow.objects.filter(user=user),
+                to_attr='viewer_follows'
+            )
+        )
+
+    def lock(self):
+        """Lock rows of the recipes until the current transaction ends."""
+        return list(self.select_for_update().values_list('pk', flat=True))
+
+    def touch(self, **fields):
+        """
+        Mark recipes as modified without loading them, updating the
+        given fields (usually counter changes with F()) in the same query.
+        """
+        return self.update(updated_at=timezone.now(), **fields)
+
+    def search(self, text):
+        """
+        Return recipes matching all words of the text, best matches
+        first; matches in the name weigh more than in the description.
+
+        PostgreSQL matches Russian word stems against the ``search_vector``
+        column kept by a trigger and indexed with GIN. SQLite matches word
+        prefixes against the ``recipes_recipe_fts`` FTS5 table kept by
+        triggers. Other databases fall back to ``icontains`` without rank.
+        """
+        vendor = connections[self.db].vendor
+        if vendor == 'postgresql':
+            query = SearchQuery(text, config=SEARCH_CONFIG)
+            return self.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F('search_vector'), query)
+            ).order_by('-search_rank', '-id')
+        if vendor == 'sqlite':
+            words = re.findall(r'\w+', text)
+            if not words:
+                return self.none()
+            query = ' '.join(f'"{word}"*' for word in words)
+            rank = Func(
+                F('search_index__document'), Value(10.0), Value(1.0),
+                function='bm25', output_field=FloatField()
+            )
+            return self.filter(
+                search_index__document__match=query
+            ).annotate(search_rank=-rank).order_by('-search_rank', '-id')
+        queryset = self
+        for word in text.split():
+            queryset = queryset.filter(
+                Q(name__icontains=word) | Q(text__icontains=word)
+            )
+        return queryset
+
+    def latest_by_author(self, authors, limit, fields):
+        """
+        Return the latest ``limit`` recipes of every given author
+        in one query, ranking recipes with ROW_NUMBER() per author.
+        Only the given fields are loaded, the rest are deferred.
+        """
+        if not authors:
+            return self.none()
+        fields = {'id', 'author', *fields}
+        ranked = self.filter(author__in=authors).only(*fields).annotate(
+            recipe_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F('author')],
+                order_by=[F('pub_date').desc(), F('id').desc()]
+            )
+        ).order_by()
+        sql, params = ranked.query.sql_with_params()
+        quote_name = connections[self.db].ops.quote_name
+        columns = ', '.join(
+            quote_name(self.model._meta.get_field(name).column)
+            for name in sorted(fields)
+        )
+        return self.model.objects.raw(
+            f'SELECT {columns} FROM ({sql}) ranked_recipes '
+            f'WHERE recipe_rank <= %s '
+            f'ORDER BY author_id, recipe_rank',
+            (*params, limit)
+        )
+
+
 class Recipe(models.Model):
     """Model for recipes."""
 
@@ -77,6 +229,12 @@ class Recipe(models.Model):
         verbose_name='Картинка',
         upload_to='recipes_images/'
     )
+    image_hash = models.CharField(
+        verbose_name='Хэш картинки',
+        max_length=64,
+        blank=True,
+        editable=False
+    )
     name = models.CharField(
         verbose_name='Название блюда',
         max_length=200
@@ -93,16 +251,73 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.IntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    carts_count = models.IntegerField(
+        verbose_name='Добавлений в списки покупок',
+        default=0,
+        editable=False
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
 
+class RecipeSearchIndex(models.Model):
+    """
+    FTS5 table searched on SQLite, created and kept in sync with recipes
+    by the recipe_search migration; the rowid is the recipe id.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_index',
+        verbose_name='Рецепт'
+    )
+    document = FullTextDocumentField(
+        db_column='recipes_recipe_fts',
+        verbose_name='Документ'
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_fts'
+        verbose_name = 'Поисковый индекс рецепта'
+        verbose_name_plural = 'Поисковый индекс рецептов'
+
+
 class IngredientAmount(models.Model):
     """Model for amount of ingredient in a recipe."""
 
@@ -157,6 +372,11 @@ class Favorite(models.Model):
         related_name='favorite',
         verbose_name='Рецепт',
     )
+    created_at = models.DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True,
+        db_index=True
+    )
 
     class Meta:
         verbose_name = 'Избранное'
@@ -167,6 +387,12 @@ class Favorite(models.Model):
                 name='unique_user_recipe'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='favorite_recipe_user_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'{self.user.username} добавил {self.recipe.name} в избранное'
@@ -187,6 +413,11 @@ class Cart(models.Model):
         related_name='cart',
         verbose_name='Рецепт',
     )
+    created_at = models.DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True,
+        db_index=True
+    )
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -197,6 +428,508 @@ class Cart(models.Model):
                 name='unique_cart'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='cart_recipe_user_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'{self.user.username} добавил {self.recipe.name} в корзину'
+
+
+class CartIngredientTotalManager(models.Manager):
+    """Manager keeping shopping cart totals in sync with carts."""
+
+    def add_recipe(self, user_ids, recipe):
+        """Add ingredients of the recipe to carts of the given users."""
+        self._change(user_ids, recipe, 1)
+
+    def remove_recipe(self, user_ids, recipe):
+        """Subtract ingredients of the recipe from carts of the users."""
+        self._change(user_ids, recipe, -1)
+        self.filter(user__in=user_ids, total__lte=0).delete()
+
+    def _change(self, user_ids, recipe, sign):
+        # Recipe updates apply ingredient deltas under the same lock, so
+        # the amounts read here are not changed until the cart commits.
+        Recipe.objects.filter(pk=recipe.pk).lock()
+        amounts = IngredientAmount.objects.filter(recipe=recipe)
+        ingredient_ids = list(amounts.values_list('ingredient_id', flat=True))
+        if not user_ids or not ingredient_ids:
+            return
+        self.bulk_create(
+            [self.model(user_id=user_id, ingredient_id=ingredient_id, total=0)
+             for user_id in user_ids for ingredient_id in ingredient_ids],
+            ignore_conflicts=True
+        )
+        self.filter(
+            user__in=user_ids, ingredient_id__in=ingredient_ids
+        ).update(
+            total=F('total') + sign * Subquery(
+                amounts.filter(
+                    ingredient=OuterRef('ingredient')
+                ).values('amount')[:1]
+            )
+        )
+
+    def apply_deltas(self, user_ids, deltas):
+        """Add {ingredient_id: delta} to carts of the given users."""
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not user_ids or not deltas:
+            return
+        self.bulk_create(
+            [self.model(user_id=user_id, ingredient_id=ingredient_id, total=0)
+             for user_id in user_ids for ingredient_id in deltas],
+            ignore_conflicts=True
+        )
+        self.filter(user__in=user_ids, ingredient_id__in=deltas).update(
+            total=F('total') + Case(
+                *[When(ingredient_id=pk, then=Value(delta))
+                  for pk, delta in deltas.items()],
+                default=Value(0),
+                output_field=models.IntegerField()
+            )
+        )
+        self.filter(user__in=user_ids, total__lte=0).delete()
+
+    def shopping_list(self, user):
+        """Return rows of the downloadable shopping list of the user."""
+        return self.filter(user=user).values(
+            'total',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit')
+        ).order_by('name')
+
+    def computed(self):
+        """Return totals from carts as {(user, ingredient): total}."""
+        totals = IngredientAmount.objects.filter(
+            recipe__cart__isnull=False
+        ).values(
+            'recipe__cart__user', 'ingredient'
+        ).order_by().annotate(total=Sum('amount'))
+        return {
+            (row['recipe__cart__user'], row['ingredient']): row['total']
+            for row in totals.iterator()
+        }
+
+    def rebuild(self):
+        """Recompute all totals from carts."""
+        self.all().delete()
+        self.bulk_create(
+            (self.model(user_id=user_id, ingredient_id=ingredient_id,
+                        total=total)
+             for (user_id, ingredient_id), total in self.computed().items()),
+            batch_size=1000
+        )
+
+
+class CartIngredientTotal(models.Model):
+    """Model for total amount of an ingredient in user's shopping cart."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredient_total',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredient_total',
+        verbose_name='Ингредиент'
+    )
+    total = models.IntegerField(
+        verbose_name='Количество',
+        default=0
+    )
+
+    objects = CartIngredientTotalManager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_cart_ingredient_total'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user.username}: {self.ingredient.name} {self.total}'
+
+
+def log2_add(first, second):
+    """Return log2(2 ** first + 2 ** second) without overflowing."""
+    high, low = max(first, second), min(first, second)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+class RecipeScoreManager(models.Manager):
+    """
+    Manager computing time-decayed popularity of recipes.
+
+    A favorite or a cart addition made at time ``t`` weighs
+    ``2 ** ((t - SCORE_EPOCH) / half-life)``. A score is log2 of the sum
+    of such weights, so it only grows with new events and never has to
+    be decayed in place, while the order of scores is the order of
+    popularity decayed to any moment. Events are counted per hour.
+    """
+
+    events = ((Favorite, 1), (Cart, 2))
+
+    def log_weight(self, moment):
+        half_life = settings.POPULAR_HALF_LIFE_DAYS * 24 * 60 * 60
+        return (moment - SCORE_EPOCH).total_seconds() / half_life
+
+    def computed(self, since=None, until=None):
+        """Return {recipe_id: score} of events in (since, until]."""
+        scores = dict()
+        for model, weight in self.events:
+            events = model.objects.all()
+            if since is not None:
+                events = events.filter(created_at__gt=since)
+            if until is not None:
+                events = events.filter(created_at__lte=until)
+            events = events.values(
+                'recipe_id', hour=TruncHour('created_at')
+            ).annotate(count=models.Count('pk')).order_by()
+            for row in events.iterator():
+                score = (math.log2(weight * row['count'])
+                         + self.log_weight(row['hour']))
+                recipe_id = row['recipe_id']
+                scores[recipe_id] = (
+                    log2_add(scores[recipe_id], score)
+                    if recipe_id in scores else score
+                )
+        return scores
+
+    def refresh(self, full=False):
+        """
+        Add events made since the last refresh to scores, or recompute
+        all scores, which also drops removed favorites and carts.
+        Return the number of updated recipes.
+        """
+        now = timezone.now()
+        since = None if full else self.aggregate(
+            last=models.Max('refreshed_at')
+        )['last']
+        scores = self.computed(since, now)
+        if full or since is None:
+            self.all().delete()
+            self.bulk_create(
+                (self.model(recipe_id=recipe_id, score=score,
+                            refreshed_at=now)
+                 for recipe_id, score in scores.items()),
+                batch_size=1000
+            )
+            return len(scores)
+        existing = self.in_bulk(list(scores))
+        created = list()
+        for recipe_id, score in scores.items():
+            item = existing.get(recipe_id)
+            if item is None:
+                created.append(self.model(
+                    recipe_id=recipe_id, score=score, refreshed_at=now
+                ))
+                continue
+            item.score = log2_add(item.score, score)
+            item.refreshed_at = now
+        self.bulk_update(
+            existing.values(), ['score', 'refreshed_at'], batch_size=1000
+        )
+        self.bulk_create(created, batch_size=1000)
+        return len(scores)
+
+
+class RecipeScore(models.Model):
+    """Model for precomputed popularity of a recipe."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Рецепт'
+    )
+    score = models.FloatField(
+        verbose_name='Популярность',
+        default=0
+    )
+    refreshed_at = models.DateTimeField(
+        verbose_name='Дата пересчёта'
+    )
+
+    objects = RecipeScoreManager()
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        indexes = [
+            models.Index(
+                fields=['-score', '-recipe'],
+                name='recipe_score_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe.name}: {self.score}'
+
+
+class TimelineEntryManager(models.Manager):
+    """
+    Manager keeping per-user timelines of recipes by followed authors.
+
+    A new recipe is written to timelines of all followers of its author
+    (fan-out on write) unless the author has more than
+    ``FEED_FANOUT_LIMIT`` followers. Recipes of such authors are pulled
+    into a timeline when it is read (fan-out on read), so a feed is
+    always read as a range of one user's entries.
+    """
+
+    def entries(self, user_id, recipes):
+        return [
+            self.model(user_id=user_id, recipe_id=recipe_id,
+                       author_id=author_id, pub_date=pub_date)
+            for recipe_id, author_id, pub_date in recipes
+        ]
+
+    def fan_out(self, recipe):
+        """Add a new recipe to timelines of followers of its author."""
+        followers = Follow.objects.filter(
+            author=recipe.author_id,
+            author__followers_count__lte=settings.FEED_FANOUT_LIMIT
+        ).values_list('user_id', flat=True)
+        self.bulk_create(
+            (self.model(user_id=user_id, recipe_id=recipe.pk,
+                        author_id=recipe.author_id, pub_date=recipe.pub_date)
+             for user_id in followers.iterator()),
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
+    def follow(self, user_id, author_id):
+        """Add the latest recipes of a newly followed author."""
+        recipes = Recipe.objects.filter(author=author_id).order_by(
+            '-pub_date', '-id'
+        ).values_list(
+            'id', 'author_id', 'pub_date'
+        )[:settings.FEED_BACKFILL_SIZE]
+        self.bulk_create(
+            self.entries(user_id, recipes), ignore_conflicts=True
+        )
+
+    def unfollow(self, user_id, author_id):
+        self.filter(user=user_id, author=author_id).delete()
+
+    def pull(self, user_id):
+        """
+        Add recipes published since the last read by followed authors
+        whose recipes are not fanned out on write. Authors never read
+        before add their latest ``FEED_BACKFILL_SIZE`` recipes, as on
+        subscribe.
+        """
+        follows = list(Follow.objects.filter(
+            user=user_id,
+            author__followers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('id', 'author_id', 'timeline_synced_at'))
+        if not follows:
+            return
+        now = timezone.now()
+        new_authors = [
+            author_id for _, author_id, synced_at in follows
+            if synced_at is None
+        ]
+        self.bulk_create(
+            self.entries(user_id, (
+                (recipe.id, recipe.author_id, recipe.pub_date)
+                for recipe in Recipe.objects.latest_by_author(
+                    new_authors, settings.FEED_BACKFILL_SIZE, ['pub_date'])
+            )),
+            ignore_conflicts=True
+        )
+        condition = Q()
+        for _, author_id, synced_at in follows:
+            if synced_at is not None:
+                condition |= Q(author=author_id, pub_date__gt=synced_at)
+        if condition:
+            # Every recipe since the last read is pulled, otherwise
+            # recipes over any cap would never reach the timeline.
+            recipes = Recipe.objects.filter(condition).values_list(
+                'id', 'author_id', 'pub_date'
+            )
+            self.bulk_create(
+                self.entries(user_id, recipes.iterator()),
+                batch_size=1000,
+                ignore_conflicts=True
+            )
+        Follow.objects.filter(
+            pk__in=[pk for pk, _, _ in follows]
+        ).update(timeline_synced_at=now)
+
+    def rebuild(self, chunk_size=500):
+        """
+        Recompute all timelines from follows with the latest recipes of
+        every followed author. Return the number of entries.
+        """
+        now = timezone.now()
+        self.all().delete()
+        authors = list(Follow.objects.order_by(
+            'author_id'
+        ).values_list('author_id', flat=True).distinct())
+        for start in range(0, len(authors), chunk_size):
+            chunk = authors[start:start + chunk_size]
+            latest = {author_id: [] for author_id in chunk}
+            for recipe in Recipe.objects.latest_by_author(
+                    chunk, settings.FEED_BACKFILL_SIZE, ['pub_date']):
+                latest[recipe.author_id].append(
+                    (recipe.id, recipe.author_id, recipe.pub_date)
+                )
+            follows = Follow.objects.filter(author__in=chunk).values_list(
+                'user_id', 'author_id'
+            )
+            self.bulk_create(
+                (entry for user_id, author_id in follows.iterator()
+                 for entry in self.entries(user_id, latest[author_id])),
+                batch_size=1000,
+                ignore_conflicts=True
+            )
+        Follow.objects.update(timeline_synced_at=now)
+        return self.count()
+
+
+class TimelineEntry(models.Model):
+    """Model for a recipe in the feed of a user following its author."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    objects = TimelineEntryManager()
+
+    class Meta:
+        ordering = ('-pub_date', '-recipe')
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_timeline_recipe'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe.name} в ленте {self.user.username}'
+
+
+class RecipeChangeCounter(models.Model):
+    """Model for the single row counting numbers of recipe changes."""
+
+    number = models.BigIntegerField(
+        default=0,
+        verbose_name='Номер последнего изменения'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчик изменений рецептов'
+        verbose_name_plural = 'Счётчик изменений рецептов'
+
+    def __str__(self) -> str:
+        return str(self.number)
+
+
+class RecipeChangeManager(models.Manager):
+    """
+    Manager of the log of recipes whose ingredients changed, read by
+    in-memory indexes of every worker process.
+
+    Numbers are taken from the ``RecipeChangeCounter`` row, which stays
+    locked until the change is committed, so changes become visible in
+    the order of their numbers and without gaps.
+    """
+
+    def log(self, recipe_id):
+        """Append the recipe to the log; return its change number."""
+        counter = RecipeChangeCounter.objects.filter(pk=1)
+        with transaction.atomic(using=self.db):
+            if not counter.update(number=F('number') + 1):
+                RecipeChangeCounter.objects.bulk_create(
+                    [RecipeChangeCounter(pk=1)], ignore_conflicts=True
+                )
+                counter.update(number=F('number') + 1)
+            number = counter.values_list('number', flat=True).get()
+            self.create(number=number, recipe_id=recipe_id)
+            if number % 1000 == 0:
+                self.filter(
+                    number__lte=number - RECIPE_CHANGE_LOG_SIZE
+                ).delete()
+        return number
+
+    def last_number(self):
+        return RecipeChangeCounter.objects.filter(pk=1).values_list(
+            'number', flat=True
+        ).first() or 0
+
+    def since(self, number):
+        """
+        Return ids of recipes changed after the given change number and
+        the last number, or None for ids if a part of the log is gone.
+        """
+        changes = list(self.filter(number__gt=number).order_by(
+            'number'
+        ).values_list('number', 'recipe_id'))
+        if not changes:
+            return [], number
+        recipe_ids = [recipe_id for _, recipe_id in changes]
+        if changes[0][0] != number + 1:
+            recipe_ids = None
+        return recipe_ids, changes[-1][0]
+
+
+class RecipeChange(models.Model):
+    """Model for a change of recipe ingredients."""
+
+    number = models.BigIntegerField(
+        unique=True,
+        verbose_name='Номер изменения'
+    )
+    # Not a foreign key: deleted recipes are logged too.
+    recipe_id = models.IntegerField(
+        verbose_name='Рецепт'
+    )
+
+    objects = RecipeChangeManager()
+
+    class Meta:
+        ordering = ('number',)
+        verbose_name = 'Изменение рецепта'
+        verbose_name_plural = 'Изменения рецептов'
+
+    def __str__(self) -> str:
+        return f'{self.number}: {self.recipe_id}'
@@ -0,0 +1,110 @@
+import io
+
+import pytest
+from django.core.cache import cache
+from PIL import Image
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from rest_framework.test import APIClient
+from users.models import CustomUser
+
+
+@pytest.fixture(autouse=True)
+def isolated_settings(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
+    }}
+    settings.IMAGE_WORKERS = 0
+    settings.METRICS_SAMPLE_RATE = 0
+    cache.clear()
+
+
+@pytest.fixture
+def png_image():
+    def png_image(size=(8, 8)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 120, 40)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    return png_image
+
+
+@pytest.fixture
+def author(django_user_model):
+    return django_user_model.objects.create_user(
+        username='author', email='author@example.com', password='password',
+        first_name='Автор', last_name='Рецептов'
+    )
+
+
+@pytest.fixture
+def viewer(django_user_model):
+    return django_user_model.objects.create_user(
+        username='viewer', email='viewer@example.com', password='password',
+        first_name='Читатель', last_name='Рецептов'
+    )
+
+
+@pytest.fixture
+def anonymous_client():
+    return APIClient()
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+@pytest.fixture
+def viewer_client(viewer):
+    client = APIClient()
+    client.force_authenticate(viewer)
+    return client
+
+
+@pytest.fixture
+def tags():
+    return [
+        Tag.objects.create(name=f'Тег {number}', color=f'#00000{number}',
+                           slug=f'tag{number}')
+        for number in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients():
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(10)
+    )
+
+
+@pytest.fixture
+def make_recipes(author, tags, ingredients):
+    def make_recipes(count, author=author, ingredient_count=3):
+        recipes = list()
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание.',
+                image='recipes_images/test.png', cooking_time=10
+            )
+            recipe.tags.set(tags[:2])
+            IngredientAmount.objects.bulk_create(
+                IngredientAmount(recipe=recipe, ingredient=ingredient,
+                                 amount=10 * (index + 1))
+                for index, ingredient in enumerate(
+                    ingredients[number % 3:][:ingredient_count])
+            )
+            recipes.append(recipe)
+        CustomUser.objects.filter(pk=author.pk).update(recipes_count=count)
+        return recipes
+
+    return make_recipes
+
+
+@pytest.fixture
+def recipe(make_recipes):
+    return make_recipes(1)[0]
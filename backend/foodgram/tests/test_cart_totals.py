@@ -0,0 +1,115 @@
+import random
+import threading
+
+import pytest
+from django.db import connection
+from recipes.models import CartIngredientTotal
+from rest_framework.test import APIClient
+
+
+def stored_totals():
+    return {
+        (row.user_id, row.ingredient_id): row.total
+        for row in CartIngredientTotal.objects.all()
+    }
+
+
+def recipe_body(recipe, ingredients):
+    return {
+        'name': recipe.name, 'text': recipe.text, 'cooking_time': 5,
+        'tags': [tag.id for tag in recipe.tags.all()],
+        'ingredients': [
+            {'id': ingredient.id, 'amount': amount}
+            for ingredient, amount in ingredients
+        ],
+    }
+
+
+@pytest.mark.django_db
+def test_totals_follow_cart_and_recipe_changes(
+        viewer_client, author_client, make_recipes, ingredients):
+    first, second = make_recipes(2)
+    viewer_client.post(f'/api/recipes/{first.id}/shopping_cart/')
+    viewer_client.post(f'/api/recipes/{second.id}/shopping_cart/')
+    assert stored_totals() == CartIngredientTotal.objects.computed()
+    response = author_client.patch(
+        f'/api/recipes/{first.id}/', recipe_body(first, [
+            (ingredients[0], 5), (ingredients[5], 7)]), format='json')
+    assert response.status_code == 200
+    assert stored_totals() == CartIngredientTotal.objects.computed()
+    viewer_client.delete(f'/api/recipes/{second.id}/shopping_cart/')
+    assert stored_totals() == CartIngredientTotal.objects.computed()
+    author_client.delete(f'/api/recipes/{first.id}/')
+    assert stored_totals() == {}
+
+
+def shop(user, recipes, seed):
+    client, rng, cart = APIClient(), random.Random(seed), set()
+    client.force_authenticate(user)
+    for _ in range(15):
+        recipe = rng.choice(recipes)
+        path = f'/api/recipes/{recipe.id}/shopping_cart/'
+        if recipe.id in cart:
+            assert client.delete(path).status_code == 204
+            cart.remove(recipe.id)
+        else:
+            assert client.post(path).status_code == 201
+            cart.add(recipe.id)
+
+
+def edit(author, recipes, ingredients, seed):
+    client, rng = APIClient(), random.Random(seed)
+    client.force_authenticate(author)
+    for _ in range(15):
+        recipe = rng.choice(recipes)
+        body = recipe_body(recipe, [
+            (ingredient, rng.randint(1, 100))
+            for ingredient in rng.sample(ingredients, 3)
+        ])
+        response = client.patch(
+            f'/api/recipes/{recipe.id}/', body, format='json')
+        assert response.status_code == 200
+
+
+def run(errors, function, *args):
+    try:
+        function(*args)
+    except Exception as error:
+        errors.append(error)
+    finally:
+        connection.close()
+
+
+def run_concurrently(errors, *calls):
+    """Run (function, *args) calls in threads, collecting raised errors."""
+    threads = [
+        threading.Thread(target=run, args=(errors, *call)) for call in calls
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.mark.skipif(
+    not connection.features.has_select_for_update,
+    reason='Concurrent writes need row locks (PostgreSQL).'
+)
+@pytest.mark.django_db(transaction=True)
+def test_totals_stay_consistent_under_concurrent_changes(
+        django_user_model, author, make_recipes, ingredients):
+    recipes = make_recipes(3)
+    shoppers = [
+        django_user_model.objects.create_user(
+            username=f'shopper{number}', email=f's{number}@example.com',
+            password='password')
+        for number in range(4)
+    ]
+    errors = list()
+    run_concurrently(
+        errors,
+        *[(shop, user, recipes, seed) for seed, user in enumerate(shoppers)],
+        (edit, author, recipes, ingredients, 100)
+    )
+    assert not errors
+    assert stored_totals() == CartIngredientTotal.objects.computed()
@@ -0,0 +1,70 @@
+import pytest
+from django.utils.http import http_date
+from recipes.models import Ingredient, Recipe, Tag
+
+
+def conditional_get(client, path, response):
+    return client.get(
+        path,
+        HTTP_IF_NONE_MATCH=response['ETag'],
+        HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+    )
+
+
+@pytest.mark.django_db
+def test_unchanged_recipe_is_not_modified(viewer_client, recipe):
+    path = f'/api/recipes/{recipe.id}/'
+    response = viewer_client.get(path)
+    assert conditional_get(viewer_client, path, response).status_code == 304
+
+
+@pytest.mark.django_db
+def test_author_rename_changes_validators(viewer_client, author, recipe):
+    path = f'/api/recipes/{recipe.id}/'
+    response = viewer_client.get(path)
+    author.first_name = 'Переименованный'
+    author.save()
+    changed = conditional_get(viewer_client, path, response)
+    assert changed.status_code == 200
+    assert changed.data['author']['first_name'] == 'Переименованный'
+
+
+@pytest.mark.django_db
+def test_login_does_not_touch_recipes(viewer_client, author, recipe):
+    path = f'/api/recipes/{recipe.id}/'
+    response = viewer_client.get(path)
+    author.save(update_fields=['last_login'])
+    assert conditional_get(viewer_client, path, response).status_code == 304
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('model, field', [
+    (Tag, 'name'), (Ingredient, 'name'), (Ingredient, 'measurement_unit')
+])
+def test_catalogue_rename_changes_validators(
+        viewer_client, recipe, model, field):
+    path = f'/api/recipes/{recipe.id}/'
+    response = viewer_client.get(path)
+    item = model.objects.filter(pk__in=(
+        recipe.tags.values('pk') if model is Tag
+        else recipe.ingredients.values('pk')
+    )).first()
+    setattr(item, field, 'другое')
+    item.save()
+    assert conditional_get(viewer_client, path, response).status_code == 200
+
+
+@pytest.mark.django_db
+def test_deleted_recipe_modifies_page(viewer_client, make_recipes):
+    make_recipes(3)
+    path = '/api/recipes/?limit=2'
+    response = viewer_client.get(path)
+    assert 'Last-Modified' not in response
+    Recipe.objects.filter(pk=response.data['results'][1]['id']).delete()
+    changed = viewer_client.get(
+        path,
+        HTTP_IF_NONE_MATCH=response['ETag'],
+        HTTP_IF_MODIFIED_SINCE=http_date(),
+    )
+    assert changed.status_code == 200
+    assert len(changed.data['results']) == 2
@@ -0,0 +1,108 @@
+import base64
+import io
+
+import pytest
+from api.counters import stale_counters
+from api.views import RecipeViewSet
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from recipes.models import Favorite, Recipe
+from users.models import CustomUser
+
+
+@pytest.mark.django_db
+def test_recipe_edit_keeps_counters_changed_meanwhile(
+        monkeypatch, author_client, viewer, recipe, tags, ingredients):
+    get_object = RecipeViewSet.get_object
+
+    def get_object_then_favorite(view):
+        instance = get_object(view)
+        Favorite.objects.create(user=viewer, recipe=instance)
+        Recipe.objects.filter(pk=instance.pk).touch(favorites_count=1)
+        return instance
+
+    monkeypatch.setattr(
+        RecipeViewSet, 'get_object', get_object_then_favorite)
+    response = author_client.patch(
+        f'/api/recipes/{recipe.id}/',
+        {'ingredients': [{'id': ingredients[0].id, 'amount': 5}],
+         'tags': [tags[0].id], 'name': 'Новое название',
+         'text': 'Описание.', 'cooking_time': 5},
+        format='json'
+    )
+    assert response.status_code == 200
+    recipe.refresh_from_db()
+    assert recipe.name == 'Новое название'
+    assert recipe.favorites_count == 1
+
+
+def counters(recipe, *users):
+    recipe = Recipe.objects.get(pk=recipe.pk)
+    users = CustomUser.objects.in_bulk([user.pk for user in users])
+    return (recipe.favorites_count, recipe.carts_count, [
+        (user.recipes_count, user.followers_count)
+        for user in users.values()
+    ])
+
+
+@pytest.mark.django_db
+def test_api_keeps_counters_in_sync(
+        author_client, viewer_client, author, viewer, recipe, tags,
+        ingredients, png_image):
+    image = base64.b64encode(png_image()).decode()
+    response = author_client.post('/api/recipes/', {
+        'ingredients': [{'id': ingredients[0].id, 'amount': 5}],
+        'tags': [tags[0].id], 'name': 'Второй рецепт', 'text': 'Описание.',
+        'cooking_time': 5, 'image': f'data:image/png;base64,{image}',
+    }, format='json')
+    assert response.status_code == 201
+    for path in ('favorite', 'shopping_cart'):
+        assert viewer_client.post(
+            f'/api/recipes/{recipe.id}/{path}/').status_code == 201
+    assert viewer_client.post(
+        f'/api/users/{author.id}/subscribe/').status_code == 201
+    assert counters(recipe, author, viewer) == (1, 1, [(2, 1), (0, 0)])
+    assert set(stale_counters().values()) == {0}
+
+    for path in (f'/api/recipes/{recipe.id}/favorite/',
+                 f'/api/recipes/{recipe.id}/shopping_cart/',
+                 f'/api/users/{author.id}/subscribe/'):
+        assert viewer_client.delete(path).status_code == 204
+    assert author_client.delete(
+        f'/api/recipes/{response.data["id"]}/').status_code == 204
+    assert counters(recipe, author, viewer) == (0, 0, [(1, 0), (0, 0)])
+    assert set(stale_counters().values()) == {0}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('path', [
+    '/api/recipes/{recipe}/favorite/',
+    '/api/users/{author}/subscribe/',
+])
+def test_repeated_delete_keeps_counters(
+        author, viewer, viewer_client, recipe, path):
+    path = path.format(recipe=recipe.id, author=author.id)
+    assert viewer_client.post(path).status_code == 201
+    assert viewer_client.delete(path).status_code == 204
+    assert viewer_client.delete(path).status_code == 404
+    assert counters(recipe, author, viewer) == (0, 0, [(1, 0), (0, 0)])
+
+
+@pytest.mark.django_db
+def test_reconcile_counters_repairs_drift(author, viewer, recipe):
+    Favorite.objects.create(user=viewer, recipe=recipe)
+    Recipe.objects.filter(pk=recipe.pk).update(carts_count=3)
+    CustomUser.objects.filter(pk=author.pk).update(followers_count=2)
+    assert stale_counters() == {
+        'Recipe.favorites_count': 1,
+        'Recipe.carts_count': 1,
+        'CustomUser.recipes_count': 0,
+        'CustomUser.followers_count': 1,
+    }
+    with pytest.raises(CommandError, match='Recipe.carts_count in 1 rows'):
+        call_command('reconcile_counters', '--verify')
+
+    call_command('reconcile_counters', stdout=io.StringIO())
+    assert counters(recipe, author, viewer) == (1, 0, [(1, 0), (0, 0)])
+    assert set(stale_counters().values()) == {0}
+    call_command('reconcile_counters', '--verify', stdout=io.StringIO())
@@ -0,0 +1,41 @@
+import pytest
+
+
+@pytest.fixture
+def big_authors(settings, author, django_user_model):
+    settings.FEED_FANOUT_LIMIT = 0
+    settings.FEED_BACKFILL_SIZE = 2
+    other = django_user_model.objects.create_user(
+        username='other', email='other@example.com', password='password',
+        first_name='Другой', last_name='Автор'
+    )
+    return author, other
+
+
+def feed_names(client):
+    response = client.get('/api/recipes/feed/?limit=20')
+    assert response.status_code == 200
+    return sorted(recipe['name'] for recipe in response.data['results'])
+
+
+@pytest.mark.django_db
+def test_feed_pulls_every_new_recipe_of_big_authors(
+        viewer_client, big_authors, make_recipes):
+    for author in big_authors:
+        assert viewer_client.post(
+            f'/api/users/{author.id}/subscribe/').status_code == 201
+    assert feed_names(viewer_client) == []
+    for author in big_authors:
+        make_recipes(3, author=author)
+    assert feed_names(viewer_client) == [
+        f'Рецепт {number}' for number in (0, 0, 1, 1, 2, 2)]
+
+
+@pytest.mark.django_db
+def test_feed_backfills_latest_recipes_of_new_big_authors(
+        viewer_client, viewer, big_authors, make_recipes):
+    author, _ = big_authors
+    make_recipes(3, author=author)
+    assert viewer_client.post(
+        f'/api/users/{author.id}/subscribe/').status_code == 201
+    assert feed_names(viewer_client) == ['Рецепт 1', 'Рецепт 2']
@@ -0,0 +1,144 @@
+import base64
+import io
+import os
+import tracemalloc
+from urllib.parse import urlparse
+
+import pytest
+from api.fields import StreamingBase64ImageField
+from api.images import (IMAGE_VARIANTS, get_image_urls, process_recipe_image,
+                        variant_name)
+from api.views import RecipeViewSet
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from recipes.models import Recipe
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+
+def media_name(url):
+    return urlparse(url).path[len(settings.MEDIA_URL):]
+
+
+@pytest.mark.django_db
+def test_uploaded_image_url_stays_valid_after_processing(
+        author_client, recipe, png_image, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.put(
+            f'/api/recipes/{recipe.id}/image/',
+            {'image': SimpleUploadedFile('photo.png', png_image(),
+                                         'image/png')},
+            format='multipart'
+        )
+    assert response.status_code == 200
+    recipe = Recipe.objects.get(pk=recipe.id)
+    assert recipe.image_hash
+    assert default_storage.exists(recipe.image.name)
+    assert default_storage.exists(media_name(response.data['image']))
+
+
+def data_url(content):
+    return 'data:image/png;base64,' + base64.b64encode(content).decode()
+
+
+def test_base64_image_is_decoded(png_image):
+    file = StreamingBase64ImageField().to_internal_value(
+        data_url(png_image()))
+    assert file.name.endswith('.png')
+    assert file.read() == png_image()
+
+
+@pytest.mark.parametrize('limit, size, message', [
+    ('RECIPE_IMAGE_MAX_SIZE', 0, 'МБ'),
+    ('RECIPE_IMAGE_MAX_PIXELS', 63, 'Разрешение'),
+])
+def test_base64_image_limits(settings, png_image, limit, size, message):
+    setattr(settings, limit, size)
+    with pytest.raises(ValidationError, match=message):
+        StreamingBase64ImageField().to_internal_value(data_url(png_image()))
+
+
+def noise_png(side=1200):
+    """Return an incompressible PNG of about 4 MB."""
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (side, side), os.urandom(side * side * 3)).save(
+        buffer, 'PNG', compress_level=0)
+    return buffer.getvalue()
+
+
+def peak_memory(function, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        result = function(*args, **kwargs)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_base64_image_is_decoded_in_chunks():
+    content = noise_png()
+    payload = data_url(content)
+    file, peak = peak_memory(
+        StreamingBase64ImageField().to_internal_value, payload)
+    assert file.size == len(content)
+    assert peak < len(content) // 4
+
+
+def test_invalid_base64_image_is_rejected():
+    with pytest.raises(ValidationError):
+        StreamingBase64ImageField().to_internal_value(
+            'data:image/png;base64,не картинка')
+
+
+@pytest.mark.django_db
+def test_uploaded_image_over_pixel_limit_is_rejected(
+        settings, author_client, recipe, png_image):
+    settings.RECIPE_IMAGE_MAX_PIXELS = 100
+    response = author_client.put(
+        f'/api/recipes/{recipe.id}/image/',
+        {'image': SimpleUploadedFile('photo.png', png_image((20, 20)),
+                                     'image/png')},
+        format='multipart'
+    )
+    assert response.status_code == 400
+    assert 'image' in response.data
+
+
+@pytest.mark.django_db
+def test_variants_are_resized_and_shared(make_recipes, png_image):
+    recipes = make_recipes(2)
+    for recipe in recipes:
+        recipe.image.save('photo.png', ContentFile(png_image((2000, 1000))))
+        process_recipe_image(recipe.id)
+    first, second = Recipe.objects.filter(pk__in=[
+        recipe.id for recipe in recipes])
+    assert first.image_hash and first.image_hash == second.image_hash
+    urls = get_image_urls(first)
+    for variant, (width, height) in IMAGE_VARIANTS.items():
+        name = variant_name(first.image_hash, variant)
+        assert urls[variant] == default_storage.url(name)
+        with default_storage.open(name) as file:
+            image = Image.open(file)
+            assert image.format == 'JPEG'
+            assert image.size == (width, width // 2)
+
+
+@pytest.mark.django_db
+def test_multipart_image_is_streamed_to_disk(author, recipe):
+    content = noise_png()
+    assert len(content) > settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    # The request is built beforehand: the test client copies its body.
+    request = APIRequestFactory().put(
+        f'/api/recipes/{recipe.id}/image/',
+        {'image': SimpleUploadedFile('photo.png', content, 'image/png')},
+        format='multipart'
+    )
+    force_authenticate(request, author)
+    view = RecipeViewSet.as_view({'put': 'image'})
+    Image.init()
+    response, peak = peak_memory(view, request, pk=recipe.id)
+    assert response.status_code == 200
+    assert peak < len(content) // 4
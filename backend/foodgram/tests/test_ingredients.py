@@ -0,0 +1,35 @@
+import pytest
+from recipes.models import Ingredient
+
+NAMES = ('сахарная пудра', 'соль', 'морская соль', 'солод', 'фасоль')
+
+
+@pytest.fixture
+def catalogue():
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit='г') for name in NAMES
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('use_index', [True, False])
+def test_autocomplete_puts_prefix_matches_first(
+        settings, anonymous_client, catalogue, use_index):
+    settings.INGREDIENT_INDEX = use_index
+    response = anonymous_client.get('/api/ingredients/?name=сол')
+    assert response.status_code == 200
+    names = [ingredient['name'] for ingredient in response.data]
+    assert names[:2] == ['солод', 'соль']
+    assert sorted(names[2:]) == ['морская соль', 'фасоль']
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('use_index', [True, False])
+def test_detail_ignores_name_filter(
+        settings, anonymous_client, catalogue, use_index):
+    settings.INGREDIENT_INDEX = use_index
+    ingredient = catalogue[1]
+    response = anonymous_client.get(
+        f'/api/ingredients/{ingredient.id}/?name=x')
+    assert response.status_code == 200
+    assert response.data['name'] == ingredient.name
@@ -0,0 +1,56 @@
+import io
+import json
+
+import pytest
+from api.management.commands.load_data import iter_json_array
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from recipes.models import Ingredient
+
+
+def stored():
+    return set(Ingredient.objects.values_list('name', 'measurement_unit'))
+
+
+def test_json_array_is_read_across_chunks():
+    items = [{'name': f'ингредиент, [{number}]', 'measurement_unit': 'г'}
+             for number in range(50)]
+    file = io.StringIO(json.dumps(items, ensure_ascii=False, indent=1))
+    assert list(iter_json_array(file, chunk_size=7)) == items
+    assert list(iter_json_array(io.StringIO(' [ ] '))) == []
+
+
+def test_incomplete_json_array_is_rejected():
+    with pytest.raises(CommandError):
+        list(iter_json_array(io.StringIO('[{"name": "соль"}, {"na')))
+
+
+@pytest.mark.django_db
+def test_csv_is_loaded_in_batches(tmp_path):
+    Ingredient.objects.create(name='соль', measurement_unit='г')
+    path = tmp_path / 'ingredients.csv'
+    path.write_text(
+        'соль,г\nперец,г\nсахар,г\nперец,г\nмука,кг\nсоль,г\nвода,мл\n',
+        encoding='utf-8'
+    )
+    output = io.StringIO()
+    call_command('load_data', path=str(path), batch_size=2, stdout=output)
+    assert stored() == {('соль', 'г'), ('перец', 'г'), ('сахар', 'г'),
+                        ('мука', 'кг'), ('вода', 'мл')}
+    assert '4 created' in output.getvalue()
+
+
+@pytest.mark.django_db
+def test_json_dry_run_and_unit_update(tmp_path):
+    Ingredient.objects.create(name='молоко', measurement_unit='г')
+    path = tmp_path / 'ingredients.json'
+    path.write_text(json.dumps([
+        {'name': 'молоко', 'measurement_unit': 'мл'},
+        {'name': 'яйцо', 'measurement_unit': 'шт.'},
+    ]), encoding='utf-8')
+    call_command('load_data', path=str(path), dry_run=True,
+                 stdout=io.StringIO())
+    assert stored() == {('молоко', 'г')}
+    call_command('load_data', path=str(path), update_units=True,
+                 batch_size=1, stdout=io.StringIO())
+    assert stored() == {('молоко', 'мл'), ('яйцо', 'шт.')}
@@ -0,0 +1,63 @@
+import pytest
+from api import middleware
+from api.metrics import MetricsBuffer, RequestMetrics, metrics_buffer
+from rest_framework.test import APIClient
+
+
+def make_metrics(route, total_time):
+    metrics = RequestMetrics()
+    metrics.route = route
+    metrics.total_time = total_time
+    metrics.sql_count = 2
+    return metrics
+
+
+def test_buffer_keeps_latest_metrics():
+    buffer = MetricsBuffer(size=3)
+    for number in range(5):
+        buffer.record(make_metrics(f'GET route-{number % 2}', number))
+    summary = buffer.summary()
+    assert summary['GET route-0']['count'] == 2
+    assert summary['GET route-0']['total_time'] == {
+        'p50': 4, 'p95': 4, 'p99': 4}
+    assert summary['GET route-1']['count'] == 1
+    assert summary['GET route-1']['sql_count']['p50'] == 2
+    buffer.clear()
+    assert buffer.summary() == {}
+
+
+@pytest.fixture
+def sampled_client(settings):
+    settings.METRICS_SAMPLE_RATE = 0.5
+    metrics_buffer.clear()
+    yield APIClient()
+    metrics_buffer.clear()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('draw, sampled', [(0.3, True), (0.7, False)])
+def test_middleware_samples_requests(
+        monkeypatch, sampled_client, recipe, draw, sampled):
+    monkeypatch.setattr(middleware.random, 'random', lambda: draw)
+    response = sampled_client.get('/api/recipes/')
+    assert response.status_code == 200
+    assert ('Server-Timing' in response) == sampled
+    routes = metrics_buffer.summary()
+    if not sampled:
+        assert routes == {}
+        return
+    assert response['Server-Timing'].startswith('db;dur=')
+    assert routes['GET recipe-list']['count'] == 1
+    assert routes['GET recipe-list']['sql_count']['p50'] > 0
+    assert routes['GET recipe-list']['serializer_time']['p50'] > 0
+
+
+@pytest.mark.django_db
+def test_metrics_are_for_admins_only(viewer_client, django_user_model):
+    assert viewer_client.get('/api/_metrics/').status_code == 403
+    admin_client = APIClient()
+    admin_client.force_authenticate(django_user_model.objects.create_user(
+        username='admin', email='admin@example.com', is_staff=True))
+    response = admin_client.get('/api/_metrics/')
+    assert response.status_code == 200
+    assert set(response.json()) == {'routes', 'recipe_cache'}
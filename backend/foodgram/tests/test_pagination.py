@@ -0,0 +1,38 @@
+import pytest
+from api.pagination import MAX_PAGE_SIZE
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe
+
+
+def count_queries(client, path):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(path)
+    assert response.status_code == 200
+    return len(context), response.data
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('client_name', ['anonymous_client', 'viewer_client'])
+def test_recipe_list_queries_do_not_depend_on_page_size(
+        request, client_name, make_recipes):
+    make_recipes(30)
+    client = request.getfixturevalue(client_name)
+    small, small_page = count_queries(client, '/api/recipes/?limit=2')
+    large, large_page = count_queries(client, '/api/recipes/?limit=30')
+    assert len(small_page['results']) == 2
+    assert len(large_page['results']) == 30
+    assert small == large
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('cursor', ['', 'cursor=&'])
+def test_recipe_list_page_size_is_capped(anonymous_client, author, cursor):
+    Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'Рецепт {number}', text='Описание.',
+               image='recipes_images/test.png', cooking_time=10)
+        for number in range(MAX_PAGE_SIZE + 5)
+    )
+    response = anonymous_client.get(f'/api/recipes/?{cursor}limit=100000')
+    assert response.status_code == 200
+    assert len(response.data['results']) == MAX_PAGE_SIZE
@@ -0,0 +1,94 @@
+import math
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from recipes.models import Cart, Favorite, RecipeScore, log2_add
+
+
+@pytest.fixture
+def users(django_user_model):
+    return [
+        django_user_model.objects.create_user(
+            username=f'user{number}', email=f'user{number}@example.com',
+            password='password'
+        )
+        for number in range(4)
+    ]
+
+
+def add_events(model, recipe, users, days_ago=0):
+    events = [model.objects.create(user=user, recipe=recipe)
+              for user in users]
+    if days_ago:
+        model.objects.filter(pk__in=[event.pk for event in events]).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+
+
+def scores():
+    return dict(RecipeScore.objects.values_list('recipe_id', 'score'))
+
+
+@pytest.mark.parametrize('first, second, expected', [
+    (3, 3, 4),
+    (1, 2, math.log2(6)),
+    (2, 1, math.log2(6)),
+    (5000, 0, 5000),
+])
+def test_log2_add(first, second, expected):
+    assert log2_add(first, second) == pytest.approx(expected)
+
+
+@pytest.mark.django_db
+def test_incremental_refresh_matches_full(make_recipes, users):
+    old, new, idle = make_recipes(3)
+    add_events(Favorite, old, users, days_ago=30)
+    add_events(Cart, new, users[:1], days_ago=1)
+    assert RecipeScore.objects.refresh() == 2
+    assert scores()[new.id] > scores()[old.id]
+
+    add_events(Favorite, new, users[:2])
+    add_events(Cart, old, users)
+    assert RecipeScore.objects.refresh() == 2
+    incremental = scores()
+    assert RecipeScore.objects.refresh() == 0
+    assert RecipeScore.objects.refresh(full=True) == 2
+    full = scores()
+    assert set(incremental) == set(full) == {old.id, new.id}
+    for recipe_id, score in full.items():
+        assert incremental[recipe_id] == pytest.approx(score)
+
+
+@pytest.mark.django_db
+def test_full_refresh_drops_removed_events(make_recipes, users):
+    kept, removed = make_recipes(2)
+    add_events(Favorite, kept, users[:1])
+    add_events(Favorite, removed, users[:1])
+    RecipeScore.objects.refresh()
+    Favorite.objects.filter(recipe=removed).delete()
+    RecipeScore.objects.refresh()
+    assert set(scores()) == {kept.id, removed.id}
+    RecipeScore.objects.refresh(full=True)
+    assert set(scores()) == {kept.id}
+
+
+@pytest.mark.django_db
+def test_popular_recipes_are_ordered_by_score(
+        viewer_client, make_recipes, users, tags):
+    first, second, third, unscored = make_recipes(4)
+    add_events(Favorite, first, users[:1], days_ago=14)
+    add_events(Favorite, second, users)
+    add_events(Cart, third, users[:1])
+    third.tags.set(tags[2:])
+    RecipeScore.objects.refresh()
+
+    response = viewer_client.get('/api/recipes/popular/')
+    assert response.status_code == 200
+    assert [recipe['id'] for recipe in response.data['results']] == [
+        second.id, third.id, first.id
+    ]
+    response = viewer_client.get('/api/recipes/popular/?tags=tag0')
+    assert [recipe['id'] for recipe in response.data['results']] == [
+        second.id, first.id
+    ]
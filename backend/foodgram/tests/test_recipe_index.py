@@ -0,0 +1,133 @@
+import random
+import threading
+import time
+
+import pytest
+from api.recipe_index import RecipeIngredientIndex, cookable_in_db
+from django.db import connection
+from recipes.models import RecipeChange
+from rest_framework.test import APIClient
+
+QUERIES = ([0], [1, 2], [0, 3, 5], [2, 4, 6, 8])
+
+
+def assert_index_matches_sql(index, ingredients):
+    for numbers in QUERIES:
+        ids = [ingredients[number].id for number in numbers]
+        for max_missing in (0, 1, 3):
+            assert list(index.cookable(ids, max_missing)) == list(
+                cookable_in_db(ids, max_missing))
+
+
+def edit_recipes(author, recipes, ingredients, seed, count=10):
+    client, rng = APIClient(), random.Random(seed)
+    client.force_authenticate(author)
+    for _ in range(count):
+        recipe = rng.choice(recipes)
+        response = client.patch(f'/api/recipes/{recipe.id}/', {
+            'name': recipe.name, 'text': recipe.text, 'cooking_time': 5,
+            'tags': [recipe.tags.first().id],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': rng.randint(1, 100)}
+                for ingredient in rng.sample(ingredients, rng.randint(1, 5))
+            ],
+        }, format='json')
+        assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_workers_follow_the_change_log(
+        author, make_recipes, ingredients,
+        django_capture_on_commit_callbacks):
+    recipes = make_recipes(8)
+    workers = [RecipeIngredientIndex(), RecipeIngredientIndex()]
+    for worker in workers:
+        assert_index_matches_sql(worker, ingredients)
+    with django_capture_on_commit_callbacks(execute=True):
+        edit_recipes(author, recipes, ingredients, seed=1)
+    assert RecipeChange.objects.last_number() == RecipeChange.objects.count()
+    for worker in workers:
+        assert_index_matches_sql(worker, ingredients)
+
+
+@pytest.mark.django_db
+def test_worker_rebuilds_when_log_is_gone(
+        author, make_recipes, ingredients,
+        django_capture_on_commit_callbacks):
+    recipes = make_recipes(8)
+    worker = RecipeIngredientIndex()
+    assert_index_matches_sql(worker, ingredients)
+    with django_capture_on_commit_callbacks(execute=True):
+        edit_recipes(author, recipes, ingredients, seed=2)
+    RecipeChange.objects.filter(number=1).delete()
+    assert_index_matches_sql(worker, ingredients)
+
+
+def run(errors, function, *args):
+    try:
+        function(*args)
+    except Exception as error:
+        errors.append(error)
+    finally:
+        connection.close()
+
+
+@pytest.mark.skipif(
+    not connection.features.has_select_for_update,
+    reason='Concurrent writes need row locks (PostgreSQL).'
+)
+@pytest.mark.django_db(transaction=True)
+def test_index_matches_sql_under_concurrent_changes(
+        author, make_recipes, ingredients):
+    recipes = make_recipes(8)
+    worker = RecipeIngredientIndex()
+    assert_index_matches_sql(worker, ingredients)
+    errors = list()
+    threads = [
+        threading.Thread(target=run, args=(
+            errors, edit_recipes, author, recipes, ingredients, seed))
+        for seed in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    numbers = list(RecipeChange.objects.values_list('number', flat=True))
+    assert numbers == list(range(1, len(numbers) + 1))
+    assert_index_matches_sql(worker, ingredients)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_threads_share_a_cold_index(monkeypatch, make_recipes, ingredients):
+    make_recipes(3)
+    index = RecipeIngredientIndex()
+    build = index._build
+
+    def slow_build():
+        time.sleep(0.2)
+        return build()
+
+    monkeypatch.setattr(index, '_build', slow_build)
+    errors = list()
+    threads = [
+        threading.Thread(target=run, args=(
+            errors, index.cookable, [ingredients[0].id]))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert_index_matches_sql(index, ingredients)
+
+
+@pytest.mark.django_db
+def test_recipe_edit_logs_one_change(
+        author, make_recipes, ingredients,
+        django_capture_on_commit_callbacks):
+    recipes = make_recipes(1, ingredient_count=3)
+    with django_capture_on_commit_callbacks(execute=True):
+        edit_recipes(author, recipes, ingredients, seed=3, count=1)
+    assert RecipeChange.objects.count() == 1
@@ -0,0 +1,49 @@
+import base64
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient
+
+
+@pytest.fixture
+def catalogue():
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'продукт {number}', measurement_unit='г')
+        for number in range(31)
+    )
+
+
+def write_recipe(client, method, path, ingredients, tags, image):
+    payload = {
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 10}
+            for ingredient in ingredients
+        ],
+        'tags': [tag.id for tag in tags[:2]], 'name': 'Суп с грибами',
+        'text': 'Описание.', 'cooking_time': 5,
+    }
+    if method == 'post':
+        payload['image'] = f'data:image/png;base64,{image}'
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(path, payload, format='json')
+    assert response.status_code == (201 if method == 'post' else 200)
+    assert len(response.data['ingredients']) == len(ingredients)
+    return len(context)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('method', ['post', 'patch'])
+def test_recipe_write_queries_do_not_depend_on_ingredients(
+        author_client, recipe, tags, catalogue, png_image, method):
+    image = base64.b64encode(png_image()).decode()
+    path = (
+        '/api/recipes/' if method == 'post' else f'/api/recipes/{recipe.id}/'
+    )
+    # Both edits keep the tags and replace every ingredient, so they run
+    # the same statements for one and for thirty rows.
+    single, many = (
+        write_recipe(author_client, method, path, ingredients, tags, image)
+        for ingredients in (catalogue[:1], catalogue[1:])
+    )
+    assert single == many
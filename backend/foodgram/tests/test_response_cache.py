@@ -0,0 +1,62 @@
+import pytest
+from api.response_cache import recipe_cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+DATABASE_CACHE = {'default': {
+    'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+    'LOCATION': 'foodgram_cache',
+}}
+
+
+@pytest.mark.django_db
+def test_author_rename_drops_cached_responses(
+        anonymous_client, author, recipe, django_capture_on_commit_callbacks):
+    path = f'/api/recipes/{recipe.id}/'
+    assert anonymous_client.get(path)['X-Cache'] == 'MISS'
+    assert anonymous_client.get(path)['X-Cache'] == 'HIT'
+    with django_capture_on_commit_callbacks(execute=True):
+        author.last_name = 'Переименованный'
+        author.save()
+    response = anonymous_client.get(path)
+    assert response['X-Cache'] == 'MISS'
+    assert response.data['author']['last_name'] == 'Переименованный'
+
+
+@pytest.mark.django_db
+def test_login_keeps_cached_responses(
+        anonymous_client, author, recipe, django_capture_on_commit_callbacks):
+    path = f'/api/recipes/{recipe.id}/'
+    anonymous_client.get(path)
+    with django_capture_on_commit_callbacks(execute=True):
+        author.save(update_fields=['last_login'])
+    assert anonymous_client.get(path)['X-Cache'] == 'HIT'
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('paths', [
+    ('/api/recipes/', '/api/recipes/?cursor='),
+    ('/api/recipes/?cursor=', '/api/recipes/'),
+])
+def test_empty_cursor_is_cached_separately(anonymous_client, recipe, paths):
+    for path in paths:
+        response = anonymous_client.get(path)
+        assert response['X-Cache'] == 'MISS'
+        assert ('count' in response.data) == ('cursor' not in path)
+
+
+@pytest.mark.django_db
+def test_hit_only_reads_database_cache(anonymous_client, recipe, settings):
+    settings.CACHES = DATABASE_CACHE
+    path = f'/api/recipes/{recipe.id}/'
+    anonymous_client.get(path)
+    before = recipe_cache.stats()
+    with CaptureQueriesContext(connection) as context:
+        assert anonymous_client.get(path)['X-Cache'] == 'HIT'
+    assert all(
+        query['sql'].lstrip().upper().startswith('SELECT')
+        for query in context.captured_queries
+    )
+    stats = recipe_cache.stats()
+    assert stats['hits'] == before['hits'] + 1
+    assert stats['misses'] == before['misses']
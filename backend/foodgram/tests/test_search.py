@@ -0,0 +1,14 @@
+import pytest
+from recipes.models import Recipe
+
+
+@pytest.mark.django_db
+def test_search_ranks_name_matches_first(anonymous_client, author):
+    for name, text in (('Пирог', 'Добавить грибы.'), ('Суп с грибами', ''),
+                       ('Салат', 'Нарезать овощи.')):
+        Recipe.objects.create(author=author, name=name, text=text,
+                              image='recipes_images/test.png', cooking_time=5)
+    response = anonymous_client.get('/api/recipes/?search=гриб')
+    assert response.status_code == 200
+    assert [recipe['name'] for recipe in response.data['results']] == [
+        'Суп с грибами', 'Пирог']
@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+
+import pytest
+from api.exporters import SHOPPING_CART_EXPORTERS, TextExporter
+
+
+def download(client, format):
+    response = client.get(
+        f'/api/recipes/download_shopping_cart/?format={format}')
+    assert response.status_code == 200
+    assert response.streaming
+    return b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+def test_download_sums_ingredients_of_cart(viewer_client, make_recipes):
+    first, second = make_recipes(2)
+    for recipe in (first, second):
+        response = viewer_client.post(
+            f'/api/recipes/{recipe.id}/shopping_cart/')
+        assert response.status_code == 201
+    rows = json.loads(download(viewer_client, 'json'))
+    assert rows == [
+        {'total': 10, 'name': 'ингредиент 0', 'measurement_unit': 'г'},
+        {'total': 30, 'name': 'ингредиент 1', 'measurement_unit': 'г'},
+        {'total': 50, 'name': 'ингредиент 2', 'measurement_unit': 'г'},
+        {'total': 30, 'name': 'ингредиент 3', 'measurement_unit': 'г'},
+    ]
+    table = list(csv.reader(io.StringIO(download(viewer_client, 'csv'))))
+    assert table[0] == ['Ингредиент', 'Количество', 'Единица измерения']
+    assert table[2] == ['ингредиент 1', '30', 'г']
+    text = download(viewer_client, 'txt')
+    assert text.startswith('Список покупок: \n')
+    assert 'ингредиент 2 - 50 г \n' in text
+
+
+@pytest.mark.parametrize('exporter_class', SHOPPING_CART_EXPORTERS)
+def test_exporter_reads_rows_lazily(exporter_class):
+    consumed = list()
+
+    def rows():
+        for number in range(1000):
+            consumed.append(number)
+            yield {'name': f'ингредиент {number}', 'total': number,
+                   'measurement_unit': 'г'}
+
+    chunks = exporter_class().stream(rows())
+    next(chunks)
+    next(chunks)
+    assert len(consumed) <= 1
+    assert len(list(chunks)) >= 999
+    assert len(consumed) == 1000
+
+
+@pytest.mark.django_db
+def test_download_requires_authentication(anonymous_client):
+    response = anonymous_client.get(
+        f'/api/recipes/download_shopping_cart/?format={TextExporter.format}')
+    assert response.status_code == 401
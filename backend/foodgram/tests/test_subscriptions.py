@@ -0,0 +1,99 @@
+import pytest
+from api.pagination import SubscriptionsPagination
+from api.serializers import RECIPES_LIMIT
+from api.views import UserViewSet
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from users.models import Follow
+
+
+@pytest.fixture
+def follow_authors(viewer, django_user_model, make_recipes):
+    def follow_authors(count, recipes=4):
+        start = django_user_model.objects.count()
+        authors = [
+            django_user_model.objects.create_user(
+                username=f'writer{number}', email=f'w{number}@example.com',
+                password='password', first_name='Имя', last_name='Фамилия'
+            )
+            for number in range(start, start + count)
+        ]
+        Follow.objects.bulk_create(
+            Follow(user=viewer, author=author) for author in authors
+        )
+        return {
+            author.id: [recipe.id for recipe in reversed(
+                make_recipes(recipes, author=author))]
+            for author in authors
+        }
+
+    return follow_authors
+
+
+@pytest.mark.django_db
+def test_subscriptions_are_paginated_by_username(viewer_client, viewer,
+                                                 django_user_model):
+    authors = [
+        django_user_model.objects.create_user(
+            username=f'author{number}', email=f'a{number}@example.com',
+            password='password', first_name='Имя', last_name='Фамилия'
+        )
+        for number in (3, 1, 2)
+    ]
+    Follow.objects.bulk_create(
+        Follow(user=viewer, author=author) for author in authors
+    )
+    response = viewer_client.get('/api/users/subscriptions/?limit=2')
+    assert response.status_code == 200
+    assert response.data['count'] == 3
+    assert [user['username'] for user in response.data['results']] == [
+        'author1', 'author2']
+    response = viewer_client.get('/api/users/subscriptions/?cursor=')
+    assert [user['username'] for user in response.data['results']] == [
+        'author1', 'author2', 'author3']
+
+
+def test_subscriptions_action_does_not_change_viewset_pagination():
+    assert UserViewSet.pagination_class is not SubscriptionsPagination
+    assert UserViewSet.subscriptions.kwargs['pagination_class'] is (
+        SubscriptionsPagination)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query, limit', [
+    ('', RECIPES_LIMIT), ('recipes_limit=1', 1), ('recipes_limit=0', 0),
+    ('recipes_limit=10', 4), ('recipes_limit=x', RECIPES_LIMIT),
+])
+def test_subscriptions_honour_recipes_limit(
+        viewer_client, follow_authors, query, limit):
+    latest = follow_authors(2)
+    response = viewer_client.get(f'/api/users/subscriptions/?{query}')
+    assert response.status_code == 200
+    for author in response.data['results']:
+        assert [recipe['id'] for recipe in author['recipes']] == (
+            latest[author['id']][:limit])
+        assert author['recipes_count'] == 4
+
+
+@pytest.mark.django_db
+def test_subscribe_honours_recipes_limit(viewer_client, author, make_recipes):
+    make_recipes(4)
+    response = viewer_client.post(
+        f'/api/users/{author.id}/subscribe/?recipes_limit=2')
+    assert response.status_code == 201
+    assert len(response.data['recipes']) == 2
+
+
+@pytest.mark.django_db
+def test_subscriptions_queries_do_not_depend_on_authors(
+        viewer_client, follow_authors):
+    queries = list()
+    for count, total in ((1, 1), (9, 10)):
+        follow_authors(count)
+        with CaptureQueriesContext(connection) as context:
+            response = viewer_client.get(
+                '/api/users/subscriptions/?limit=10')
+        assert response.status_code == 200
+        assert len(response.data['results']) == total
+        queries.append(len(context))
+    assert queries[0] == queries[1]
@@ -0,0 +1,53 @@
+import pytest
+from recipes.models import Tag
+
+
+def recipe_ids(client, query):
+    response = client.get(f'/api/recipes/?limit=50&{query}')
+    assert response.status_code == 200
+    ids = [recipe['id'] for recipe in response.data['results']]
+    assert len(ids) == len(set(ids))
+    return set(ids)
+
+
+@pytest.fixture
+def tagged(make_recipes, tags):
+    both, first, third = make_recipes(3)
+    first.tags.set(tags[:1])
+    third.tags.set(tags[2:])
+    return both.id, first.id, third.id
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query, expected', [
+    ('tags=tag0', {0, 1}),
+    ('tags=tag0&tags=tag1', {0, 1}),
+    ('tags=tag0&tags=tag2', {0, 1, 2}),
+    ('tags=tag0&tags=tag1&tags_match=any', {0, 1}),
+    ('tags=tag0&tags=tag1&tags_match=all', {0}),
+    ('tags=tag0&tags=tag2&tags_match=all', set()),
+    ('tags=tag1&tags=tag1&tags_match=all', {0}),
+    ('tags=unknown', set()),
+    ('tags=tag2&tags=unknown', {2}),
+    ('tags=tag2&tags=unknown&tags_match=all', set()),
+])
+def test_recipes_are_filtered_by_tags(viewer_client, tagged, query, expected):
+    assert recipe_ids(viewer_client, query) == {
+        tagged[index] for index in expected
+    }
+
+
+@pytest.mark.django_db
+def test_new_and_renamed_tags_are_found(
+        viewer_client, tagged, tags, django_capture_on_commit_callbacks):
+    assert recipe_ids(viewer_client, 'tags=fresh') == set()
+    with django_capture_on_commit_callbacks(execute=True):
+        fresh = Tag.objects.create(name='Новый', color='#123456',
+                                   slug='fresh')
+    fresh.recipes.add(tagged[2])
+    assert recipe_ids(viewer_client, 'tags=fresh') == {tagged[2]}
+    with django_capture_on_commit_callbacks(execute=True):
+        tags[2].slug = 'renamed'
+        tags[2].save()
+    assert recipe_ids(viewer_client, 'tags=renamed') == {tagged[2]}
+    assert recipe_ids(viewer_client, 'tags=tag2') == set()
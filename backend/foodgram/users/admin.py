@@ -7,6 +7,9 @@ from .models import CustomUser, Follow
 class CustomUserAdmit(admin.ModelAdmin):
     """Admin model for CustomUser."""
 
+    list_display = (
+        'username', 'email', 'recipes_count', 'followers_count',
+    )
     list_filter = ('username', 'email', )
 
 
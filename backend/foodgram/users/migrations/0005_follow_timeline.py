@@ -0,0 +1,36 @@
+# Generated by Django 4.1.7 on 2026-10-18 02:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_followers_count(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Follow = apps.get_model('users', 'Follow')
+    CustomUser.objects.update(followers_count=Coalesce(Subquery(
+        Follow.objects.filter(author=OuterRef('pk')).order_by().values(
+            'author'
+        ).annotate(total=Count('pk')).values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_customuser_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='follow',
+            name='timeline_synced_at',
+            field=models.DateTimeField(auto_now_add=True, null=True, verbose_name='Дата обновления ленты'),
+        ),
+        migrations.RunPython(fill_followers_count, migrations.RunPython.noop),
+    ]
@@ -18,6 +18,16 @@ class CustomUser(AbstractUser):
     )
     first_name = models.CharField(verbose_name='Имя', max_length=150)
     last_name = models.CharField(verbose_name='Фамилия', max_length=150)
+    recipes_count = models.IntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.IntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -46,6 +56,11 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор'
     )
+    timeline_synced_at = models.DateTimeField(
+        verbose_name='Дата обновления ленты',
+        auto_now_add=True,
+        null=True
+    )
 
     class Meta:
         ordering = ('-id',)